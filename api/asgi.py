@@ -0,0 +1,113 @@
+"""
+ASGI server for battery health prediction with request micro-batching
+
+Serves the same /api/predict and /api/health contract as api/predict.py.
+Concurrent predictions are grouped into micro-batches and scored with one
+vectorized predict_proba call per batch.
+
+Run locally with any ASGI server, e.g.:
+    uvicorn --app-dir api asgi:app --port 8000
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health.compiled import COMPILED_FILE, load_compiled
+from battery_health.inference import InvalidReading, format_prediction, parse_reading, validate_reading
+from battery_health.microbatch import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, MicroBatcher
+
+# Load model and scaler (paths relative to project root unless BATTERY_MODEL_DIR is set)
+model_dir = Path(os.environ.get("BATTERY_MODEL_DIR", Path(__file__).parent.parent / "models"))
+MAX_BATCH_SIZE = int(os.environ.get("BATTERY_MAX_BATCH_SIZE", DEFAULT_MAX_BATCH_SIZE))
+MAX_WAIT_MS = float(os.environ.get("BATTERY_MAX_WAIT_MS", DEFAULT_MAX_WAIT_MS))
+
+batcher = None
+
+def load_models():
+    """Load the trained model and scaler, preferring the compiled archive"""
+    if (model_dir / COMPILED_FILE).exists():
+        return load_compiled(model_dir / COMPILED_FILE)
+    import joblib
+    return joblib.load(model_dir / "battery_model.pkl"), joblib.load(model_dir / "battery_scaler.pkl")
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+async def lifespan(receive, send):
+    global batcher
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            try:
+                model, scaler = load_models()
+                batcher = MicroBatcher(model, scaler, MAX_BATCH_SIZE, MAX_WAIT_MS)
+                batcher.start()
+                await send({'type': 'lifespan.startup.complete'})
+            except Exception as e:
+                await send({'type': 'lifespan.startup.failed', 'message': f"Failed to load ML models: {e}"})
+        elif message['type'] == 'lifespan.shutdown':
+            if batcher is not None:
+                await batcher.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def predict(receive, send):
+    """Validate one reading, then score it as part of the next micro-batch"""
+    if batcher is None:
+        return await send_json(send, 500, {"error": "Failed to load ML models"})
+    try:
+        data = json.loads(await read_body(receive) or b'{}')
+        values = parse_reading(data)
+        validate_reading(values)
+        prediction, probabilities = await batcher.submit(values)
+        return await send_json(send, 200, format_prediction(values, prediction, probabilities))
+    except InvalidReading as e:
+        return await send_json(send, 400, {"error": str(e)})
+    except ValueError as e:
+        return await send_json(send, 400, {"error": f"Invalid input: {e}"})
+    except Exception as e:
+        return await send_json(send, 500, {"error": f"Prediction failed: {e}"})
+
+async def health(send):
+    await send_json(send, 200, {
+        "status": "healthy",
+        "service": "Battery Health Prediction API",
+        "version": "2.0.0",
+        "model_loaded": batcher is not None,
+        "batching": batcher.stats() if batcher is not None else None
+    })
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    method, path = scope['method'], scope['path']
+    if path == '/api/predict' and method == 'POST':
+        return await predict(receive, send)
+    if path == '/api/health' and method == 'GET':
+        return await health(send)
+    if path in ('/api/predict', '/api/health'):
+        return await send_json(send, 405, {"error": "Method not allowed"})
+    return await send_json(send, 404, {"error": "Not found"})
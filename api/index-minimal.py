@@ -2,10 +2,13 @@
 Pandas-free Vercel-compatible API for battery health prediction
 """
 import json
-import numpy as np
-import joblib
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health.compiled import COMPILED_FILE, load_compiled
+from battery_health.inference import InvalidReading, predict_reading
+
 # Load models once when function starts
 model_dir = Path(__file__).parent.parent / "models"
 model = None
@@ -15,9 +18,14 @@ def load_models():
     """Load ML models"""
     global model, scaler
     try:
+        # Prefer the exported NumPy archive, which avoids importing scikit-learn
+        if (model is None or scaler is None) and (model_dir / COMPILED_FILE).exists():
+            model, scaler = load_compiled(model_dir / COMPILED_FILE)
         if model is None:
+            import joblib
             model = joblib.load(model_dir / "battery_model.pkl")
         if scaler is None:
+            import joblib
             scaler = joblib.load(model_dir / "battery_scaler.pkl")
         return True
     except Exception as e:
@@ -77,104 +85,19 @@ def handler(event, context):
         if http_method == 'POST':
             body = json.loads(event.get('body', '{}'))
             
-            # Validate required fields
-            required_fields = ['voltage', 'current', 'temperature', 'age_months']
-            for field in required_fields:
-                if field not in body:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({"error": f"Missing field: {field}"})
-                    }
-            
-            # Extract and validate values
+            # Validate and score through the shared prediction core
             try:
-                voltage = float(body['voltage'])
-                current = float(body['current'])
-                temperature = float(body['temperature'])
-                age_months = int(body['age_months'])
-                resistance = float(body.get('resistance', 0.03))
-            except (ValueError, TypeError):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({"error": "Invalid number format in input"})
-                }
-            
-            # Validate ranges
-            if not (10.5 <= voltage <= 13.0):
+                response = predict_reading(model, scaler, body)
+            except InvalidReading as e:
                 return {
                     'statusCode': 400,
                     'headers': {
                         'Content-Type': 'application/json',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    'body': json.dumps({"error": "Voltage must be between 10.5V and 13.0V"})
+                    'body': json.dumps({"error": str(e)})
                 }
             
-            # Create feature array (no pandas)
-            features = np.array([[voltage, current, temperature, age_months, resistance]])
-            
-            # Scale features and make prediction
-            features_scaled = scaler.transform(features)
-            prediction = model.predict(features_scaled)[0]
-            probabilities = model.predict_proba(features_scaled)[0]
-            
-            # Generate response
-            status_map = {0: "Healthy", 1: "Weak", 2: "Failed"}
-            status_emoji = {0: "✅", 1: "⚠️", 2: "❌"}
-            status_name = status_map.get(prediction, "Unknown")
-            confidence = float(probabilities[prediction]) * 100
-            
-            # Risk factors
-            risk_factors = []
-            if voltage < 12.0:
-                risk_factors.append("Low voltage")
-            if age_months > 48:
-                risk_factors.append("High age")
-            if resistance > 0.05:
-                risk_factors.append("High resistance")
-            if temperature > 35:
-                risk_factors.append("High temperature")
-            
-            # Recommendations
-            recommendations = []
-            if prediction == 0:
-                recommendations.append("Battery is in good condition")
-                recommendations.append("Regular maintenance recommended")
-            elif prediction == 1:
-                recommendations.append("Monitor battery performance closely")
-                recommendations.append("Consider replacement soon")
-            else:
-                recommendations.append("Replace battery immediately")
-                recommendations.append("Do not rely on this battery")
-            
-            response = {
-                "status": f"{status_name} {status_emoji[prediction]}",
-                "prediction": int(prediction),
-                "confidence": round(confidence, 1),
-                "probabilities": {
-                    "healthy": round(float(probabilities[0]) * 100, 1),
-                    "weak": round(float(probabilities[1]) * 100, 1),
-                    "failed": round(float(probabilities[2]) * 100, 1)
-                },
-                "risk_factors": risk_factors,
-                "recommendations": recommendations,
-                "input_values": {
-                    "voltage": voltage,
-                    "current": current,
-                    "temperature": temperature,
-                    "age_months": age_months,
-                    "resistance": resistance
-                }
-            }
-            
             return {
                 'statusCode': 200,
                 'headers': {
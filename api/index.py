@@ -1,213 +1,395 @@
 """
 Pandas-free Vercel-compatible API for battery health prediction
 """
+import atexit
 import json
-import numpy as np
-import joblib
-from huggingface_hub import hf_hub_download
+import os
+import sys
+import threading
+import time
+from pathlib import Path
 
-# Load models once when function starts
-REPO_ID = "nitin-y2309/battery_health"
-MODEL_FILE = "battery_model.pkl"
-SCALER_FILE = "battery_scaler.pkl"
-model = None
-scaler = None
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health.admission import client_key, coalescer_from_env, limiter_from_env, retry_after
+from battery_health.metrics import metrics_from_env
+from battery_health.model_store import MODEL_FILE, REPO_ID, SCALER_FILE, ModelStore
+
+# NumPy and the prediction core are imported by load_models(), so CORS
+# preflight and health checks never pay for them.
+batch = None
+drift = None
+explain = None
+inference = None
+render = None
+shadow = None
+telemetry = None
+prediction_store = None
+projection = None
+model_registry = None
+
+# Static response parts, built once per instance rather than per request
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+PREFLIGHT_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, X-Model-Version'
+}
+JSON_CORS_HEADERS = {'Content-Type': 'application/json', **PREFLIGHT_HEADERS}
+METRICS_HEADERS = {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+MODEL_LOAD_ERROR_BODY = json.dumps({"error": "Failed to load ML models"})
+UNAUTHORIZED_BODY = json.dumps({"error": "Unauthorized"})
+METHOD_NOT_ALLOWED_BODY = json.dumps({"error": "Method not allowed"})
+METRICS_DISABLED_BODY = json.dumps({"error": "Metrics are disabled"})
+STORE_DISABLED_BODY = json.dumps({"error": "Prediction store is disabled"})
+RATE_LIMITED_BODY = json.dumps({"error": "Too many requests"})
+
+# Models are loaded once per instance into a registry that can swap in new
+# revisions without a restart
+registry = None
+store = ModelStore(REPO_ID)
+prediction_cache = None
+telemetry_store = None
+prediction_history = None
+# Opened on the first load attempt only, so retries do not leak stores and flusher threads
+prediction_history_opened = False
+drift_monitor = None
+shadow_scorer = None
+metrics = metrics_from_env()
+rate_limiter = limiter_from_env()
+coalescer = coalescer_from_env()
+startup = {
+    "import_seconds": None,
+    "download_seconds": None,
+    "load_seconds": None,
+    "total_seconds": None,
+    "artifact_source": None,
+}
+load_lock = threading.Lock()
+
+# Optional precomputed probability table; requests can still ask for exact inference
+LOOKUP_TABLE = os.environ.get("BATTERY_LOOKUP_TABLE")
+EXACT_INFERENCE = os.environ.get("BATTERY_EXACT_INFERENCE", "0") == "1"
+lookup_model = None
+lookup_scaler = None
+# The version the table was built from; it stands in for no other
+lookup_version = None
+
+def load_revision(revision):
+    """Fetch and load one model revision, preferring the exported NumPy archive"""
+    from battery_health.compiled import COMPILED_FILE, load_compiled
+    revision_store = store if revision == store.revision else ModelStore(REPO_ID, revision)
+    started = time.perf_counter()
+    
+    # The NumPy archive avoids importing scikit-learn
+    paths = revision_store.fetch([], optional=[COMPILED_FILE])
+    if COMPILED_FILE not in paths:
+        paths = revision_store.fetch([MODEL_FILE, SCALER_FILE])
+    downloaded = time.perf_counter()
+    
+    if COMPILED_FILE in paths:
+        try:
+            loaded_model, loaded_scaler = load_compiled(paths[COMPILED_FILE])
+        except Exception as e:
+            # A corrupt or incompatible archive must not take the instance down
+            print(f"Compiled model unusable, falling back to pickles: {e}")
+            fetched = time.perf_counter()
+            paths = revision_store.fetch([MODEL_FILE, SCALER_FILE])
+            downloaded += time.perf_counter() - fetched
+    if COMPILED_FILE not in paths:
+        import joblib
+        loaded_model = joblib.load(paths[MODEL_FILE])
+        loaded_scaler = joblib.load(paths[SCALER_FILE])
+    return loaded_model, loaded_scaler, {
+        "sha": revision_store.sha,
+        "artifact": COMPILED_FILE if COMPILED_FILE in paths else MODEL_FILE,
+        "source": revision_store.source,
+        "download_seconds": round(downloaded - started, 4),
+        "load_seconds": round(time.perf_counter() - downloaded, 4),
+    }
+
+def on_version_activated(version):
+    """Cached outputs and drift sketches belong to the previous model once another version is active"""
+    global drift_monitor, lookup_model, lookup_scaler, lookup_version
+    if prediction_cache is not None:
+        prediction_cache.clear(version.model)
+    drift_monitor = drift.drift_from_env(version.scaler)
+    if lookup_version is not None and registry is not None:
+        # Once the table's version has been evicted or reloaded it can never be active again
+        if registry.state[1].get(lookup_version.name) is not lookup_version:
+            lookup_model = lookup_scaler = lookup_version = None
+
+def lookup_serves(version):
+    """True when the lookup table may answer for `version`: it was built from it and it is active"""
+    return version is not None and version is lookup_version and version is registry.active
 
 def load_models():
-    """Load ML models"""
-    global model, scaler
-    try:
-        if model is None:
-            model_path = hf_hub_download(repo_id=REPO_ID, filename=MODEL_FILE)
-            model = joblib.load(model_path)
-        if scaler is None:
-            scaler_path = hf_hub_download(repo_id=REPO_ID, filename=SCALER_FILE)
-            scaler = joblib.load(scaler_path)
+    """Load ML models, waiting for a background load already in progress"""
+    global registry, lookup_model, lookup_scaler, lookup_version, prediction_cache, telemetry_store, prediction_history
+    global prediction_history_opened, shadow_scorer
+    global batch, drift, explain, inference, model_registry, projection, render, shadow, telemetry, prediction_store
+    if registry is not None and registry.active is not None:
         return True
-    except Exception as e:
-        print(f"Model loading error: {e}")
-        return False
+    with load_lock:
+        if registry is not None and registry.active is not None:
+            return True
+        try:
+            started = time.perf_counter()
+            from battery_health import batch, drift, explain, inference, prediction_store, projection, render, shadow, telemetry
+            from battery_health.cache import cache_from_env
+            from battery_health import registry as model_registry
+            imported = time.perf_counter()
+            
+            if LOOKUP_TABLE and not EXACT_INFERENCE:
+                from battery_health.lookup import load_lookup
+                lookup_model, lookup_scaler = load_lookup(LOOKUP_TABLE)
+            prediction_cache = cache_from_env()
+            telemetry_store = telemetry.telemetry_from_env()
+            if not prediction_history_opened:
+                prediction_history = prediction_store.store_from_env()
+                if prediction_history is not None:
+                    atexit.register(prediction_history.close)
+                prediction_history_opened = True
+            loading_registry = model_registry.registry_from_env(load_revision, on_activate=on_version_activated)
+            version = loading_registry.load(store.revision)
+            info = version.info
+            # The table is built offline from the revision served at startup
+            lookup_version = version if lookup_model is not None else None
+            shadow_scorer = shadow.shadow_from_env(loading_registry)
+            finished = time.perf_counter()
+            
+            startup["import_seconds"] = round(imported - started, 4)
+            startup["download_seconds"] = info["download_seconds"]
+            startup["load_seconds"] = round(finished - imported - info["download_seconds"], 4)
+            startup["total_seconds"] = round(finished - started, 4)
+            startup["artifact_source"] = info["source"]
+            # Publish the registry last: requests treat an active version as ready
+            registry = loading_registry
+            return True
+        except Exception as e:
+            print(f"Model loading error: {e}")
+            return False
+
+# Start loading as soon as the instance initialises instead of on the first request
+if os.environ.get("BATTERY_EAGER_LOAD", "1") == "1":
+    threading.Thread(target=load_models, name="model-loader", daemon=True).start()
+
+def header(event, name):
+    """Case-insensitive request header lookup; `name` is lower case"""
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+def score_single(model, scaler, body, cache, shadowing):
+    """Score one reading and do its bookkeeping
+
+    Returns (score_reading result, OOD score, explanation); the explanation
+    is None unless the body asks for one.
+    """
+    scoring = time.perf_counter()
+    result = inference.score_reading(model, scaler, body, cache=cache, metrics=metrics)
+    if shadowing is not None:
+        shadowing.submit(*result[:3], time.perf_counter() - scoring)
+    if prediction_history is not None:
+        prediction_history.append_one(*result[:3])
+    ood_score = drift_monitor.observe(result[0]) if drift_monitor is not None else None
+    explanation = None
+    if explain.explain_requested(body):
+        explanation = explain.explain_reading(model, scaler, result[0], result[1])
+    return result, ood_score, explanation
+
+def render_single(result, ood_score, explanation):
+    """Response body for one scored reading; explanations skip the pre-rendered templates"""
+    if explanation is None:
+        return render.render_prediction(*result, ood_score)
+    response = inference.format_prediction(*result)
+    if ood_score is not None:
+        response["ood_score"] = ood_score
+    response["explanation"] = explanation
+    return render.dumps(response)
 
 def handler(event, context):
     """Vercel serverless function entry point"""
+    if metrics is None:
+        return route(event)
+    started = time.perf_counter()
+    response = route(event)
+    if event.get('httpMethod') == 'POST':
+        metrics.observe("total", time.perf_counter() - started)
+    metrics.count_response(response['statusCode'])
+    return response
+
+def route(event):
+    """Dispatch one request to the preflight, metrics, health or prediction path"""
     try:
-        # Load models if needed
-        if not load_models():
-            return {
-                'statusCode': 500,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type'
-                },
-                'body': json.dumps({"error": "Failed to load ML models"})
-            }
-        
         # Parse request
         http_method = event.get('httpMethod', 'GET')
         path = event.get('path', '/')
         
         # Handle CORS preflight
         if http_method == 'OPTIONS':
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type'
-                },
-                'body': ''
-            }
+            return {'statusCode': 200, 'headers': PREFLIGHT_HEADERS, 'body': ''}
+        
+        # Prometheus metrics endpoint
+        if path.endswith('/metrics'):
+            if metrics is None:
+                return {'statusCode': 404, 'headers': JSON_HEADERS, 'body': METRICS_DISABLED_BODY}
+            return {'statusCode': 200, 'headers': METRICS_HEADERS, 'body': metrics.render()}
+        
+        # Stored prediction queries (admin only)
+        if path.endswith('/predictions') and http_method == 'GET':
+            if not load_models():
+                return {'statusCode': 500, 'headers': JSON_CORS_HEADERS, 'body': MODEL_LOAD_ERROR_BODY}
+            if not model_registry.admin_authorized(header(event, 'authorization')):
+                return {'statusCode': 401, 'headers': JSON_HEADERS, 'body': UNAUTHORIZED_BODY}
+            if prediction_history is None:
+                return {'statusCode': 404, 'headers': JSON_HEADERS, 'body': STORE_DISABLED_BODY}
+            try:
+                query = prediction_store.parse_query(event.get('queryStringParameters') or {})
+                response_body = render.dumps(prediction_history.query(**query))
+                return {'statusCode': 200, 'headers': JSON_HEADERS, 'body': response_body}
+            except inference.InvalidReading as e:
+                return {'statusCode': 400, 'headers': JSON_HEADERS, 'body': json.dumps({"error": str(e)})}
         
         # Health check endpoint
         if path.endswith('/health') or http_method == 'GET':
             return {
                 'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
+                'headers': JSON_HEADERS,
                 'body': json.dumps({
                     "status": "healthy",
                     "service": "Battery Health Prediction API",
                     "version": "2.1.0",
-                    "model_loaded": model is not None and scaler is not None,
+                    "model_loaded": registry is not None and registry.active is not None,
                     "model_source": "Hugging Face Hub",
                     "model_url": f"https://huggingface.co/{REPO_ID}/tree/main",
+                    "model_revision": store.sha,
+                    "model_loading": load_lock.locked(),
+                    "active_version": registry.active.name if registry and registry.active else None,
+                    "model_versions": registry.stats() if registry else None,
+                    "startup": startup,
+                    "prediction_cache": prediction_cache.stats() if prediction_cache else None,
+                    "telemetry": telemetry_store.stats() if telemetry_store else None,
+                    "prediction_store": prediction_history.stats() if prediction_history else None,
+                    "coalescing": coalescer.stats() if coalescer else None,
+                    "rate_limit": rate_limiter.stats() if rate_limiter else None,
+                    "drift": drift_monitor.summary() if drift_monitor else None,
+                    "shadow": shadow_scorer.stats() if shadow_scorer else None,
+                    "inference": "lookup" if registry is not None and lookup_serves(registry.active) else "exact",
                     "framework": "pandas-free"
                 })
             }
         
         # Prediction endpoint
         if http_method == 'POST':
-            body = json.loads(event.get('body', '{}'))
-            
-            # Validate required fields
-            required_fields = ['voltage', 'current', 'temperature', 'age_months']
-            for field in required_fields:
-                if field not in body:
-                    return {
-                        'statusCode': 400,
-                        'headers': {
-                            'Content-Type': 'application/json',
-                            'Access-Control-Allow-Origin': '*'
-                        },
-                        'body': json.dumps({"error": f"Missing field: {field}"})
-                    }
-            
-            # Extract and validate values
-            try:
-                voltage = float(body['voltage'])
-                current = float(body['current'])
-                temperature = float(body['temperature'])
-                age_months = int(body['age_months'])
-                resistance = float(body.get('resistance', 0.03))
-            except (ValueError, TypeError):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({"error": "Invalid number format in input"})
-                }
-            
-            # Validate ranges
-            if not (10.5 <= voltage <= 13.0):
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({"error": "Voltage must be between 10.5V and 13.0V"})
-                }
-            
-            # Create feature array (no pandas)
-            features = np.array([[voltage, current, temperature, age_months, resistance]])
+            # Turn away clients over their rate before any decoding or model work
+            if rate_limiter is not None and not path.endswith('/models'):
+                client = client_key(header(event, 'x-forwarded-for'), header(event, 'x-real-ip'))
+                wait = rate_limiter.acquire(client)
+                if wait:
+                    if metrics is not None:
+                        metrics.count_rate_limited()
+                    headers = {**JSON_CORS_HEADERS, 'Retry-After': retry_after(wait)}
+                    return {'statusCode': 429, 'headers': headers, 'body': RATE_LIMITED_BODY}
             
-            # Scale features and make prediction
-            features_scaled = scaler.transform(features)
-            prediction = model.predict(features_scaled)[0]
-            probabilities = model.predict_proba(features_scaled)[0]
+            # Load models if needed
+            if not load_models():
+                return {'statusCode': 500, 'headers': JSON_CORS_HEADERS, 'body': MODEL_LOAD_ERROR_BODY}
             
-            # Generate response
-            status_map = {0: "Healthy", 1: "Weak", 2: "Failed"}
-            status_emoji = {0: "✅", 1: "⚠️", 2: "❌"}
-            status_name = status_map.get(prediction, "Unknown")
-            confidence = float(probabilities[prediction]) * 100
-            
-            # Risk factors
-            risk_factors = []
-            if voltage < 12.0:
-                risk_factors.append("Low voltage")
-            if age_months > 48:
-                risk_factors.append("High age")
-            if resistance > 0.05:
-                risk_factors.append("High resistance")
-            if temperature > 35:
-                risk_factors.append("High temperature")
+            started = time.perf_counter()
+            body = json.loads(event.get('body', '{}'))
+            if metrics is not None:
+                metrics.observe("decode", time.perf_counter() - started)
             
-            # Recommendations
-            recommendations = []
-            if prediction == 0:
-                recommendations.append("Battery is in good condition")
-                recommendations.append("Regular maintenance recommended")
-            elif prediction == 1:
-                recommendations.append("Monitor battery performance closely")
-                recommendations.append("Consider replacement soon")
-            else:
-                recommendations.append("Replace battery immediately")
-                recommendations.append("Do not rely on this battery")
+            # Load or activate a model version in the background (admin only)
+            if path.endswith('/models'):
+                if not model_registry.admin_authorized(header(event, 'authorization')):
+                    return {'statusCode': 401, 'headers': JSON_HEADERS, 'body': UNAUTHORIZED_BODY}
+                try:
+                    status, response = model_registry.apply_admin_request(registry, body)
+                except inference.InvalidReading as e:
+                    return {'statusCode': 400, 'headers': JSON_HEADERS, 'body': json.dumps({"error": str(e)})}
+                return {'statusCode': status, 'headers': JSON_HEADERS, 'body': json.dumps(response)}
             
-            response = {
-                "status": f"{status_name} {status_emoji[prediction]}",
-                "prediction": int(prediction),
-                "confidence": round(confidence, 1),
-                "probabilities": {
-                    "healthy": round(float(probabilities[0]) * 100, 1),
-                    "weak": round(float(probabilities[1]) * 100, 1),
-                    "failed": round(float(probabilities[2]) * 100, 1)
-                },
-                "risk_factors": risk_factors,
-                "recommendations": recommendations,
-                "input_values": {
-                    "voltage": voltage,
-                    "current": current,
-                    "temperature": temperature,
-                    "age_months": age_months,
-                    "resistance": resistance
-                }
-            }
+            # Validate and score through the shared prediction core
+            try:
+                # A request naming a version bypasses the lookup table and the cache of the active one;
+                # explanations need the forest itself
+                requested = model_registry.requested_version(body, header(event, 'x-model-version'))
+                version = registry.get(requested)
+                exact = isinstance(body, dict) and (body.get('exact') or explain.explain_requested(body))
+                if requested is None and lookup_serves(version) and not exact:
+                    active_model, active_scaler, cache = lookup_model, lookup_scaler, None
+                elif version is registry.active:
+                    active_model, active_scaler, cache = version.model, version.scaler, prediction_cache
+                else:
+                    active_model, active_scaler, cache = version.model, version.scaler, None
+                # Only traffic served by the active version is compared with the candidate
+                shadowing = shadow_scorer if version is registry.active else None
+                if path.endswith(('/project', '/project/batch')):
+                    # Projections are what-if sweeps, not observed readings: no cache, store, drift or shadow
+                    scoring = time.perf_counter()
+                    if path.endswith('/batch'):
+                        response = projection.project_batch(active_model, active_scaler, body)
+                    else:
+                        response = projection.project_reading(active_model, active_scaler, body)
+                    scored = time.perf_counter()
+                    if metrics is not None:
+                        metrics.observe("projection", scored - scoring)
+                    response_body = render.dumps(response)
+                elif path.endswith('/batch'):
+                    scoring = time.perf_counter()
+                    response = batch.predict_batch(
+                        active_model, active_scaler, body,
+                        store=prediction_history, drift=drift_monitor, shadow=shadowing
+                    )
+                    scored = time.perf_counter()
+                    if metrics is not None:
+                        metrics.observe("batch", scored - scoring)
+                        metrics.count_predictions(r["prediction"] for r in response["results"] if "error" not in r)
+                    response_body = render.dumps(response)
+                elif path.endswith('/telemetry'):
+                    response = telemetry.ingest_reading(
+                        active_model, active_scaler, telemetry_store, body,
+                        cache=cache, metrics=metrics, history=prediction_history, drift=drift_monitor,
+                        shadow=shadowing
+                    )
+                    scored = time.perf_counter()
+                    response_body = render.dumps(response)
+                elif coalescer is None:
+                    outcome = score_single(active_model, active_scaler, body, cache, shadowing)
+                    scored = time.perf_counter()
+                    response_body = render_single(*outcome)
+                else:
+                    # Identical requests in flight at the same time share one scoring pass
+                    outcome, shared = coalescer.run(
+                        (requested, event.get('body')),
+                        lambda: score_single(active_model, active_scaler, body, cache, shadowing)
+                    )
+                    if shared and metrics is not None:
+                        # Only the leader's score_reading counted the prediction
+                        metrics.count_coalesced()
+                        metrics.count_prediction(outcome[0][1])
+                    scored = time.perf_counter()
+                    response_body = render_single(*outcome)
+                if metrics is not None:
+                    metrics.observe("serialize", time.perf_counter() - scored)
+            except inference.InvalidReading as e:
+                if metrics is not None:
+                    metrics.count_rejected(e.reason)
+                return {'statusCode': 400, 'headers': JSON_HEADERS, 'body': json.dumps({"error": str(e)})}
             
-            return {
-                'statusCode': 200,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*',
-                    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                    'Access-Control-Allow-Headers': 'Content-Type'
-                },
-                'body': json.dumps(response)
-            }
+            return {'statusCode': 200, 'headers': JSON_CORS_HEADERS, 'body': response_body}
         
         # Method not allowed
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({"error": "Method not allowed"})
-        }
+        return {'statusCode': 405, 'headers': JSON_HEADERS, 'body': METHOD_NOT_ALLOWED_BODY}
         
     except Exception as e:
         return {
             'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
+            'headers': JSON_HEADERS,
             'body': json.dumps({"error": f"Server error: {str(e)}"})
-        }
\ No newline at end of file
+        }
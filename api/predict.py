@@ -1,33 +1,137 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import joblib
+from flask import Flask, Response, g, request, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
+import atexit
 import os
+import sys
+import threading
+import time
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health import batch
+from battery_health.admission import client_key, coalescer_from_env, limiter_from_env, retry_after
+from battery_health.cache import cache_from_env
+from battery_health.drift import drift_from_env
+from battery_health.explain import explain_reading, explain_requested
+from battery_health.inference import InvalidReading, format_prediction, score_reading
+from battery_health.metrics import metrics_from_env
+from battery_health.prediction_store import parse_query, store_from_env
+from battery_health.projection import project_batch, project_reading
+from battery_health.registry import (
+    LOCAL_VERSION,
+    admin_authorized,
+    apply_admin_request,
+    directory_loader,
+    registry_from_env,
+    requested_version,
+)
+from battery_health.shadow import shadow_from_env
+from battery_health.telemetry import ingest_reading, telemetry_from_env
+
 # Initialize Flask app
 app = Flask(__name__)
+# X-Forwarded-For is client-supplied; only honour the hops our own proxies append
+TRUSTED_PROXIES = int(os.environ.get("BATTERY_TRUSTED_PROXIES", "0"))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+
+# Model versions (paths relative to project root unless BATTERY_MODEL_DIR is set).
+# The "local" version is the directory itself; other versions are sub-directories.
+model_dir = Path(os.environ.get("BATTERY_MODEL_DIR", Path(__file__).parent.parent / "models"))
+
+prediction_cache = cache_from_env()
+metrics = metrics_from_env()
+telemetry_store = telemetry_from_env()
+prediction_history = store_from_env()
+if prediction_history is not None:
+    # Seal the rows still buffered when the server stops
+    atexit.register(prediction_history.close)
+rate_limiter = limiter_from_env()
+coalescer = coalescer_from_env()
+drift_monitor = None
 
-# Load model and scaler (paths relative to project root)
-model_dir = Path(__file__).parent.parent / "models"
-model_path = model_dir / "battery_model.pkl"
-scaler_path = model_dir / "battery_scaler.pkl"
+def on_version_activated(version):
+    """Start fresh cache and drift sketches for the newly active model"""
+    global drift_monitor
+    if prediction_cache is not None:
+        prediction_cache.clear(version.model)
+    drift_monitor = drift_from_env(version.scaler, model_dir)
 
-# Global variables for model and scaler
-model = None
-scaler = None
+registry = registry_from_env(directory_loader(model_dir), on_activate=on_version_activated)
+shadow_scorer = None
+load_lock = threading.Lock()
 
 def load_models():
-    """Load the trained model and scaler"""
-    global model, scaler
-    try:
-        if model is None:
-            model = joblib.load(model_path)
-        if scaler is None:
-            scaler = joblib.load(scaler_path)
+    """Load the local model version, preferring the compiled archive"""
+    global shadow_scorer
+    if registry.active is not None:
         return True
-    except Exception as e:
-        print(f"Error loading models: {e}")
-        return False
+    with load_lock:
+        if registry.active is not None:
+            return True
+        try:
+            registry.load(LOCAL_VERSION)
+            # Started after the local version so the candidate can never become the default
+            shadow_scorer = shadow_from_env(registry)
+            return True
+        except Exception as e:
+            print(f"Error loading models: {e}")
+            return False
+
+def select_model(data):
+    """(model, scaler, cache, shadow) for the version the request names, else the active one
+
+    Only traffic served by the active version uses the cache and is shadowed.
+    """
+    version = registry.get(requested_version(data, request.headers.get('X-Model-Version')))
+    if version is registry.active:
+        return version.model, version.scaler, prediction_cache, shadow_scorer
+    return version.model, version.scaler, None, None
+
+def score_single(model, scaler, data, cache, shadowing):
+    """Score one reading and do its bookkeeping; returns the response dict"""
+    scoring = time.perf_counter()
+    values, prediction, probabilities, risk = score_reading(
+        model, scaler, data, cache=cache, metrics=metrics
+    )
+    if shadowing is not None:
+        shadowing.submit(values, prediction, probabilities, time.perf_counter() - scoring)
+    if prediction_history is not None:
+        prediction_history.append_one(values, prediction, probabilities)
+    response = format_prediction(values, prediction, probabilities, risk)
+    if drift_monitor is not None:
+        response["ood_score"] = drift_monitor.observe(values)
+    if explain_requested(data):
+        response["explanation"] = explain_reading(model, scaler, values, prediction)
+    return response
+
+@app.before_request
+def start_timer():
+    if metrics is not None:
+        g.started = time.perf_counter()
+
+@app.before_request
+def admit():
+    """Answer 429 straight away when the client is over its rate"""
+    if rate_limiter is None or request.method != 'POST' or request.path == '/api/models':
+        return None
+    # remote_addr is the peer, or the forwarded client when BATTERY_TRUSTED_PROXIES is set
+    wait = rate_limiter.acquire(client_key(fallback=request.remote_addr))
+    if wait:
+        if metrics is not None:
+            metrics.count_rate_limited()
+        response = jsonify({"error": "Too many requests"})
+        response.headers['Retry-After'] = retry_after(wait)
+        return response, 429
+    return None
+
+@app.after_request
+def record_response(response):
+    if metrics is not None:
+        if request.method == 'POST':
+            metrics.observe("total", time.perf_counter() - g.started)
+        metrics.count_response(response.status_code)
+    return response
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
@@ -37,103 +141,132 @@ def predict():
         if not load_models():
             return jsonify({"error": "Failed to load ML models"}), 500
         
+        started = time.perf_counter()
         data = request.get_json()
+        if metrics is not None:
+            metrics.observe("decode", time.perf_counter() - started)
+        model, scaler, cache, shadowing = select_model(data)
+        if coalescer is None:
+            response = score_single(model, scaler, data, cache, shadowing)
+        else:
+            # Identical requests in flight at the same time share one scoring pass
+            key = (request.headers.get('X-Model-Version'), request.get_data())
+            response, shared = coalescer.run(key, lambda: score_single(model, scaler, data, cache, shadowing))
+            if shared and metrics is not None:
+                # Only the leader's score_reading counted the prediction
+                metrics.count_coalesced()
+                metrics.count_prediction(response["prediction"])
         
-        # Validate required fields
-        required_fields = ['voltage', 'current', 'temperature', 'age_months']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing field: {field}"}), 400
-        
-        # Extract values with default resistance
-        voltage = float(data['voltage'])
-        current = float(data['current'])
-        temperature = float(data['temperature'])
-        age_months = int(data['age_months'])
-        resistance = float(data.get('resistance', 0.03))
+        scored = time.perf_counter()
+        response = jsonify(response)
+        if metrics is not None:
+            metrics.observe("serialize", time.perf_counter() - scored)
+        return response
         
-        # Validate input ranges
-        if not (10.5 <= voltage <= 13.0):
-            return jsonify({"error": "Voltage must be between 10.5V and 13.0V"}), 400
-        if not (50 <= current <= 350):
-            return jsonify({"error": "Current must be between 50A and 350A"}), 400
-        if not (-30 <= temperature <= 60):
-            return jsonify({"error": "Temperature must be between -30°C and 60°C"}), 400
-        if not (1 <= age_months <= 120):
-            return jsonify({"error": "Age must be between 1 and 120 months"}), 400
-        if not (0.01 <= resistance <= 0.15):
-            return jsonify({"error": "Resistance must be between 0.01Ω and 0.15Ω"}), 400
-        
-        # Create feature dataframe and predict
-        features = pd.DataFrame([{
-            "voltage": voltage,
-            "current": current,
-            "temperature": temperature,
-            "age_months": age_months,
-            "resistance": resistance
-        }])
-        
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
-        probabilities = model.predict_proba(features_scaled)[0]
+    except InvalidReading as e:
+        if metrics is not None:
+            metrics.count_rejected(e.reason)
+        return jsonify({"error": str(e)}), 400
+    except ValueError as e:
+        return jsonify({"error": f"Invalid input: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score a list of readings with one vectorized model call"""
+    try:
+        if not load_models():
+            return jsonify({"error": "Failed to load ML models"}), 500
         
-        # Enhanced status mapping with confidence
-        status_map = {0: "Healthy", 1: "Weak", 2: "Failed"}
-        status_emoji = {0: "✅", 1: "⚠️", 2: "❌"}
-        status_name = status_map.get(prediction, "Unknown")
-        confidence = float(probabilities[prediction]) * 100
+        data = request.get_json()
+        model, scaler, _, shadowing = select_model(data)
+        started = time.perf_counter()
+        response = batch.predict_batch(
+            model, scaler, data, store=prediction_history, drift=drift_monitor, shadow=shadowing
+        )
+        if metrics is not None:
+            metrics.observe("batch", time.perf_counter() - started)
+            metrics.count_predictions(r["prediction"] for r in response["results"] if "error" not in r)
+        return jsonify(response)
         
-        # Additional analysis
-        risk_factors = []
-        if voltage < 12.0:
-            risk_factors.append("Low voltage")
-        if age_months > 48:
-            risk_factors.append("High age")
-        if resistance > 0.05:
-            risk_factors.append("High resistance")
-        if temperature < -10 or temperature > 40:
-            risk_factors.append("Extreme temperature")
+    except InvalidReading as e:
+        if metrics is not None:
+            metrics.count_rejected(e.reason)
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+
+@app.route('/api/telemetry', methods=['POST'])
+def ingest_telemetry():
+    """Score a reading from a known battery and update its rolling trend"""
+    try:
+        if not load_models():
+            return jsonify({"error": "Failed to load ML models"}), 500
         
-        # Recommendations based on prediction
-        recommendations = []
-        if prediction == 0:  # Healthy
-            recommendations.append("Battery is in good condition")
-            recommendations.append("Regular maintenance recommended")
-        elif prediction == 1:  # Weak
-            recommendations.append("Monitor battery performance closely")
-            recommendations.append("Consider replacement soon")
-            recommendations.append("Check charging system")
-        else:  # Failed
-            recommendations.append("Replace battery immediately")
-            recommendations.append("Do not rely on this battery")
-            recommendations.append("Check vehicle electrical system")
+        data = request.get_json()
+        model, scaler, cache, shadowing = select_model(data)
+        return jsonify(ingest_reading(
+            model, scaler, telemetry_store, data,
+            cache=cache, metrics=metrics, history=prediction_history, drift=drift_monitor,
+            shadow=shadowing
+        ))
         
-        response = {
-            "status": f"{status_name} {status_emoji[prediction]}",
-            "prediction": int(prediction),
-            "confidence": round(confidence, 1),
-            "probabilities": {
-                "healthy": round(float(probabilities[0]) * 100, 1),
-                "weak": round(float(probabilities[1]) * 100, 1),
-                "failed": round(float(probabilities[2]) * 100, 1)
-            },
-            "risk_factors": risk_factors,
-            "recommendations": recommendations,
-            "input_values": {
-                "voltage": voltage,
-                "current": current,
-                "temperature": temperature,
-                "age_months": age_months,
-                "resistance": resistance
-            }
-        }
+    except InvalidReading as e:
+        if metrics is not None:
+            metrics.count_rejected(e.reason)
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Prediction failed: {e}"}), 500
+
+@app.route('/api/project', methods=['POST'])
+@app.route('/api/project/batch', methods=['POST'])
+def project():
+    """Project when readings will turn Weak and Failed under resistance growth scenarios"""
+    try:
+        if not load_models():
+            return jsonify({"error": "Failed to load ML models"}), 500
         
+        data = request.get_json()
+        model, scaler, _, _ = select_model(data)
+        started = time.perf_counter()
+        if request.path.endswith('/batch'):
+            response = project_batch(model, scaler, data)
+        else:
+            response = project_reading(model, scaler, data)
+        if metrics is not None:
+            metrics.observe("projection", time.perf_counter() - started)
         return jsonify(response)
         
-    except ValueError as e:
-        return jsonify({"error": f"Invalid input: {e}"}), 400
+    except InvalidReading as e:
+        if metrics is not None:
+            metrics.count_rejected(e.reason)
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": f"Prediction failed: {e}"}), 500
+        return jsonify({"error": f"Projection failed: {e}"}), 500
+
+@app.route('/api/models', methods=['POST'])
+def manage_models():
+    """Load a model version in the background or activate a resident one (admin only)"""
+    if not admin_authorized(request.headers.get('Authorization')):
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        status, response = apply_admin_request(registry, request.get_json(silent=True))
+        return jsonify(response), status
+    except InvalidReading as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/predictions', methods=['GET'])
+def query_predictions():
+    """Query stored predictions by class, probability and feature ranges (admin only)"""
+    if not admin_authorized(request.headers.get('Authorization')):
+        return jsonify({"error": "Unauthorized"}), 401
+    if prediction_history is None:
+        return jsonify({"error": "Prediction store is disabled"}), 404
+    try:
+        return jsonify(prediction_history.query(**parse_query(request.args)))
+    except InvalidReading as e:
+        return jsonify({"error": str(e)}), 400
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -142,9 +275,25 @@ def health_check():
         "status": "healthy",
         "service": "Battery Health Prediction API",
         "version": "2.0.0",
-        "model_loaded": model is not None and scaler is not None
+        "model_loaded": registry.active is not None,
+        "active_version": registry.active.name if registry.active else None,
+        "model_versions": registry.stats(),
+        "prediction_cache": prediction_cache.stats() if prediction_cache else None,
+        "telemetry": telemetry_store.stats(),
+        "prediction_store": prediction_history.stats() if prediction_history else None,
+        "coalescing": coalescer.stats() if coalescer else None,
+        "rate_limit": rate_limiter.stats() if rate_limiter else None,
+        "drift": drift_monitor.summary() if drift_monitor else None,
+        "shadow": shadow_scorer.stats() if shadow_scorer else None
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus metrics endpoint"""
+    if metrics is None:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 # Vercel serverless function handler
 def handler(event, context):
     """Main handler for Vercel serverless function"""
@@ -1,39 +1,99 @@
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
 import gradio as gr
 import joblib
-import numpy as np
-from huggingface_hub import hf_hub_download
-
-# Hugging Face repo info
-REPO_ID = "nitin-y2309/battery_health"
-MODEL_FILE = "battery_model.pkl"
-SCALER_FILE = "battery_scaler.pkl"
 
-# Download model files from Hugging Face Hub
-model_path = hf_hub_download(repo_id=REPO_ID, filename=MODEL_FILE)
-scaler_path = hf_hub_download(repo_id=REPO_ID, filename=SCALER_FILE)
+from battery_health.bulk import ID_FIELD, detect_format, score_stream
+from battery_health.compiled import COMPILED_FILE, load_compiled
+from battery_health.inference import predict_reading
+from battery_health.model_store import MODEL_FILE, REPO_ID, SCALER_FILE, ModelStore
 
-model = joblib.load(model_path)
-scaler = joblib.load(scaler_path)
+# Fetch model files from Hugging Face Hub, reusing the verified local copy if present.
+# The compiled archive (BATTERY_COMPILED_FILE) is preferred when the repo publishes it.
+store = ModelStore(REPO_ID)
+paths = store.fetch([], optional=[COMPILED_FILE])
+if COMPILED_FILE in paths:
+    model, scaler = load_compiled(paths[COMPILED_FILE])
+else:
+    paths = store.fetch([MODEL_FILE, SCALER_FILE])
+    model = joblib.load(paths[MODEL_FILE])
+    scaler = joblib.load(paths[SCALER_FILE])
 
-status_map = {0: "Healthy ✅", 1: "Weak ⚠️", 2: "Failed ❌"}
+# Requests share one model; the queue runs at most this many at a time and
+# turns callers away once it is full.
+CONCURRENCY_LIMIT = int(os.environ.get("BATTERY_GRADIO_CONCURRENCY", 2))
+MAX_QUEUE_SIZE = int(os.environ.get("BATTERY_GRADIO_QUEUE_SIZE", 64))
+MAX_UPLOAD_ROWS = int(os.environ.get("BATTERY_GRADIO_MAX_ROWS", 100000))
+# Scored files live under one directory removed at exit; Gradio copies each
+# into its own cache when it is returned, so ours are pruned after an hour.
+RESULTS_DIR = tempfile.TemporaryDirectory(prefix="battery_scored_")
+RESULT_MAX_AGE_SECONDS = 3600
 
 # Prediction function
 
 def predict(voltage, current, temperature, age_months, resistance):
     try:
-        features = np.array([[voltage, current, temperature, age_months, resistance]])
-        features_scaled = scaler.transform(features)
-        prediction = model.predict(features_scaled)[0]
-        probabilities = model.predict_proba(features_scaled)[0]
-        status = status_map.get(prediction, "Unknown")
-        confidence = float(probabilities[prediction]) * 100
-        result = f"Status: {status}\nConfidence: {confidence:.1f}%\nProbabilities: Healthy {probabilities[0]*100:.1f}%, Weak {probabilities[1]*100:.1f}%, Failed {probabilities[2]*100:.1f}%"
-        return result
+        result = predict_reading(model, scaler, {
+            "voltage": voltage,
+            "current": current,
+            "temperature": temperature,
+            "age_months": age_months,
+            "resistance": resistance
+        })
+        probabilities = result["probabilities"]
+        return f"Status: {result['status']}\nConfidence: {result['confidence']:.1f}%\nProbabilities: Healthy {probabilities['healthy']:.1f}%, Weak {probabilities['weak']:.1f}%, Failed {probabilities['failed']:.1f}%"
     except Exception as e:
         return f"Error: {str(e)}"
 
+def prune_results():
+    """Delete scored uploads older than RESULT_MAX_AGE_SECONDS"""
+    cutoff = time.time() - RESULT_MAX_AGE_SECONDS
+    for result in Path(RESULTS_DIR.name).iterdir():
+        try:
+            if result.stat().st_mtime < cutoff:
+                shutil.rmtree(result)
+        except FileNotFoundError:
+            pass
+
+def score_file(path):
+    """Score every row of an uploaded CSV (or NDJSON) file; returns (results file, summary)"""
+    if path is None:
+        return None, "Upload a CSV file with columns: voltage, current, temperature, age_months, resistance"
+    path = Path(getattr(path, "name", path))
+    input_format = detect_format(path)
+    prune_results()
+    output_dir = None
+    try:
+        with open(path, newline="", encoding="utf-8") as source:
+            if sum(1 for _ in source) - (input_format == "csv") > MAX_UPLOAD_ROWS:
+                return None, f"Error: files are limited to {MAX_UPLOAD_ROWS} rows"
+            source.seek(0)
+            # A directory per upload keeps the download named after the upload
+            output_dir = Path(tempfile.mkdtemp(dir=RESULTS_DIR.name))
+            output_path = output_dir / f"{path.stem}_scored.csv"
+            with open(output_path, "w", newline="", encoding="utf-8") as sink:
+                # One chunk, so the whole upload is scored with a single predict_proba call
+                stats = score_stream(model, scaler, source, sink, input_format, "csv",
+                                     chunk_size=MAX_UPLOAD_ROWS)
+    except Exception as e:
+        if output_dir is not None:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        return None, f"Error: {str(e)}"
+    scored = stats["rows"] - stats["failed"]
+    lines = [f"Scored {scored} of {stats['rows']} rows in {stats['seconds']:.2f}s"]
+    for status, count in stats["statuses"].items():
+        share = count / scored * 100 if scored else 0.0
+        lines.append(f"{status}: {count} ({share:.1f}%)")
+    if stats["failed"]:
+        lines.append(f"Invalid rows: {stats['failed']} (see the 'error' column)")
+    return str(output_path), "\n".join(lines)
+
 # Gradio UI
-iface = gr.Interface(
+single = gr.Interface(
     fn=predict,
     inputs=[
         gr.Number(label="Voltage (V)", value=12.6),
@@ -47,4 +107,20 @@ iface = gr.Interface(
     description="Enter your battery parameters to get an instant health assessment. Powered by Machine Learning."
 )
 
-iface.launch()
+upload = gr.Interface(
+    fn=score_file,
+    inputs=gr.File(label="Readings (CSV)", file_types=[".csv", ".ndjson", ".jsonl"], type="filepath"),
+    outputs=[
+        gr.File(label="Scored readings"),
+        gr.Textbox(label="Summary", lines=6)
+    ],
+    title="Battery Health Prediction",
+    description=f"Upload a CSV with voltage, current, temperature, age_months and optional resistance "
+                f"(and {ID_FIELD}) columns, up to {MAX_UPLOAD_ROWS} rows. Every row is scored in one pass."
+)
+
+iface = gr.TabbedInterface([single, upload], ["Single reading", "CSV upload"])
+iface.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=MAX_QUEUE_SIZE)
+
+if __name__ == "__main__":
+    iface.launch()
@@ -0,0 +1,3 @@
+"""
+Shared helpers for the battery health prediction entry points
+"""
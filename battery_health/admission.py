@@ -0,0 +1,163 @@
+"""
+Admission control for prediction requests: in-flight coalescing and rate limits
+
+Coalescer lets identical requests that arrive while one of them is being
+scored share that computation: the first becomes the leader and runs it, the
+rest wait for its result instead of scoring the same reading again.
+RateLimiter keeps a token bucket per client, so a client over its rate gets
+an immediate 429 with a Retry-After hint rather than a place in a queue.
+
+Both use only the standard library, so handlers can apply them before NumPy
+and the model load.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_CLIENTS = 10000
+ANONYMOUS_CLIENT = "anonymous"
+
+
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Coalescer:
+    """Share one computation among concurrent calls with the same key"""
+
+    def __init__(self):
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def run(self, key, compute):
+        """Return (result of compute(), shared); `shared` is True if another call computed it
+
+        Exceptions raised by the leader's computation are raised in every
+        caller that waited on it.
+        """
+        with self.lock:
+            call = self.inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self.inflight[key] = _InFlight()
+                self.leaders += 1
+            else:
+                self.followers += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self):
+        with self.lock:
+            total = self.leaders + self.followers
+            return {
+                "computed": self.leaders,
+                "coalesced": self.followers,
+                "in_flight": len(self.inflight),
+                "coalesced_ratio": round(self.followers / total, 4) if total else 0.0,
+            }
+
+
+class RateLimiter:
+    """Token bucket per client: `rate` requests per second with bursts of up to `burst`
+
+    Up to `max_clients` buckets are kept; the least recently seen client is
+    forgotten first, which only ever gives it a full bucket back.
+    """
+
+    def __init__(self, rate, burst, max_clients=DEFAULT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.admitted = 0
+        self.throttled = 0
+
+    def acquire(self, client, now=None):
+        """Take a token for `client`; returns 0.0 if admitted, else seconds until one is available"""
+        if now is None:
+            now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(client)
+            if bucket is None:
+                if len(self.buckets) >= self.max_clients:
+                    self.buckets.popitem(last=False)
+                bucket = self.buckets[client] = [float(self.burst), now]
+            else:
+                self.buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                self.admitted += 1
+                return 0.0
+            self.throttled += 1
+            return (1.0 - bucket[0]) / self.rate
+
+    def stats(self):
+        with self.lock:
+            return {
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "clients": len(self.buckets),
+                "max_clients": self.max_clients,
+                "admitted": self.admitted,
+                "throttled": self.throttled,
+            }
+
+
+def retry_after(seconds):
+    """Retry-After header value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def client_key(forwarded_for=None, fallback=None):
+    """Identify the caller by the first X-Forwarded-For address, else `fallback`
+
+    Only pass `forwarded_for` when a trusted proxy sets the header; otherwise
+    callers can choose their own key.
+    """
+    if forwarded_for:
+        return forwarded_for.split(",", 1)[0].strip() or ANONYMOUS_CLIENT
+    return fallback or ANONYMOUS_CLIENT
+
+
+def limiter_from_env():
+    """Build a RateLimiter from BATTERY_RATE_LIMIT (per client per second), or None when unset
+
+    BATTERY_RATE_BURST defaults to twice the rate, and at least 1.
+    """
+    rate = float(os.environ.get("BATTERY_RATE_LIMIT", 0) or 0)
+    if rate <= 0:
+        return None
+    burst = float(os.environ.get("BATTERY_RATE_BURST", 0) or max(1.0, 2 * rate))
+    return RateLimiter(rate, burst, int(os.environ.get("BATTERY_RATE_CLIENTS", DEFAULT_MAX_CLIENTS)))
+
+
+def coalescer_from_env():
+    """Build a Coalescer, or None when BATTERY_COALESCE=0 turns it off"""
+    if os.environ.get("BATTERY_COALESCE", "1") == "0":
+        return None
+    return Coalescer()
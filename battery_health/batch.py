@@ -0,0 +1,116 @@
+"""
+Vectorized batch scoring for fleet-scale prediction requests
+"""
+from time import perf_counter
+
+import numpy as np
+
+from .explain import explain_requested, explainer_for
+from .inference import (
+    FEATURES,
+    InvalidReading,
+    format_prediction,
+    parse_reading,
+    predict_with_proba,
+)
+from .rules import RANGE_RULES, VALID, range_error_codes, risk_codes
+
+MAX_BATCH_SIZE = 10000
+
+
+def parse_readings(readings):
+    """Build the n x 5 feature matrix, recording a parse error per bad row"""
+    features = np.zeros((len(readings), len(FEATURES)))
+    errors = [None] * len(readings)
+    for i, reading in enumerate(readings):
+        try:
+            features[i] = parse_reading(reading)
+        except InvalidReading as e:
+            errors[i] = str(e)
+    return features, errors
+
+
+def validate_ranges(features, errors, ranges=RANGE_RULES):
+    """Apply range checks to every row at once, keeping the first error per row"""
+    parsed = np.array([e is None for e in errors], dtype=bool)
+    codes = range_error_codes(features, ranges)
+    for i in np.flatnonzero(parsed & (codes != VALID)):
+        errors[i] = ranges[codes[i]][3]
+    return parsed & (codes == VALID)
+
+
+def score_batch(model, scaler, readings, ranges=RANGE_RULES):
+    """Validate and score a list of readings with one transform/predict_proba call
+
+    Returns (features, predictions, probabilities, errors); predictions and
+    probabilities are only meaningful for rows whose error is None.
+    """
+    features, errors = parse_readings(readings)
+    valid = validate_ranges(features, errors, ranges)
+    predictions = np.zeros(len(readings), dtype=int)
+    probabilities = np.zeros((len(readings), len(model.classes_)))
+    if valid.any():
+        predictions[valid], probabilities[valid] = predict_with_proba(
+            model, scaler.transform(features[valid])
+        )
+    return features, predictions, probabilities, errors
+
+
+def predict_batch(model, scaler, body, store=None, drift=None, shadow=None):
+    """Score a {"readings": [...]} request body and build the batch response
+
+    Valid rows are also appended to `store`, a PredictionStore, when given.
+    With a DriftMonitor, valid rows are folded into its sketches and each
+    result carries its "ood_score". With a ShadowScorer, valid rows are queued
+    for the candidate model. A body with "explain": true adds each valid
+    row's feature contributions, computed for the whole batch at once.
+    """
+    readings = body.get('readings') if isinstance(body, dict) else None
+    if not isinstance(readings, list):
+        raise InvalidReading("Field 'readings' must be a list", "readings_not_a_list")
+    if len(readings) > MAX_BATCH_SIZE:
+        raise InvalidReading(f"Batch size must not exceed {MAX_BATCH_SIZE} readings", "batch_too_large")
+
+    started = perf_counter()
+    features, predictions, probabilities, errors = score_batch(model, scaler, readings)
+    seconds = perf_counter() - started
+    valid = np.array([error is None for error in errors], dtype=bool)
+    if shadow is not None:
+        shadow.submit_batch(features[valid], predictions[valid], probabilities[valid], seconds)
+    if store is not None:
+        store.append(features[valid], predictions[valid], probabilities[valid])
+    ood_scores = np.zeros(len(readings))
+    if drift is not None:
+        ood_scores[valid] = drift.observe_batch(features[valid])
+    explanations = {}
+    if explain_requested(body) and valid.any():
+        rows = np.flatnonzero(valid)
+        explained = explainer_for(model).explain(scaler.transform(features[valid]), predictions[valid])
+        explanations = dict(zip(rows.tolist(), explained))
+    risks = risk_codes(features)
+    results = []
+    for i, error in enumerate(errors):
+        if error is not None:
+            results.append({"index": i, "error": error})
+            continue
+        voltage, current, temperature, age_months, resistance = features[i].tolist()
+        result = format_prediction(
+            (voltage, current, temperature, int(age_months), resistance),
+            predictions[i],
+            probabilities[i],
+            risks[i]
+        )
+        if drift is not None:
+            result["ood_score"] = float(ood_scores[i])
+        if i in explanations:
+            result["explanation"] = explanations[i]
+        result["index"] = i
+        results.append(result)
+
+    failed = sum(error is not None for error in errors)
+    return {
+        "count": len(readings),
+        "succeeded": len(readings) - failed,
+        "failed": failed,
+        "results": results
+    }
@@ -0,0 +1,147 @@
+"""
+Streaming bulk scoring of CSV or NDJSON battery readings
+
+Readings are pulled from the input in fixed-size chunks, each chunk is scored
+with one vectorized model call, and results are written before the next chunk
+is read, so memory stays flat however large the input is.
+"""
+import csv
+import itertools
+import json
+import time
+
+from .batch import score_batch
+from .inference import FEATURES, STATUS_NAMES
+from .rules import RISK_COMBINATIONS, risk_codes
+
+DEFAULT_CHUNK_SIZE = 5000
+ID_FIELD = "id"
+RESULT_FIELDS = [
+    "row", ID_FIELD, *FEATURES, "prediction", "status", "confidence",
+    "p_healthy", "p_weak", "p_failed", "risk_factors", "error",
+]
+
+
+def detect_format(path):
+    """Guess 'csv' or 'ndjson' from a file name, defaulting to CSV"""
+    name = str(path).lower()
+    return "ndjson" if name.endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def _whole_number(value):
+    """Spreadsheets export whole ages as "24.0"; return those as ints, anything else unchanged"""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else value
+
+
+def read_csv(stream):
+    for record in csv.DictReader(stream):
+        # Empty cells count as missing so the optional resistance falls back to its default
+        reading = {key: value for key, value in record.items() if value not in ("", None)}
+        if "age_months" in reading:
+            reading["age_months"] = _whole_number(reading["age_months"])
+        yield reading
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Scored as a row error rather than aborting the whole run
+            yield None
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def iter_chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score_chunk(model, scaler, readings, start=0):
+    """Score one chunk of reading dicts and return flat result rows"""
+    features, predictions, probabilities, errors = score_batch(model, scaler, readings)
+    risks = risk_codes(features)
+    results = []
+    for i, error in enumerate(errors):
+        reading = readings[i] if isinstance(readings[i], dict) else {}
+        result = {"row": start + i, ID_FIELD: reading.get(ID_FIELD)}
+        if error is not None:
+            result["error"] = error
+            results.append(result)
+            continue
+        prediction = int(predictions[i])
+        result.update(zip(FEATURES, features[i].tolist()))
+        result["age_months"] = int(result["age_months"])
+        result.update({
+            "prediction": prediction,
+            "status": STATUS_NAMES[prediction],
+            "confidence": round(float(probabilities[i, prediction]) * 100, 1),
+            "p_healthy": round(float(probabilities[i, 0]), 4),
+            "p_weak": round(float(probabilities[i, 1]), 4),
+            "p_failed": round(float(probabilities[i, 2]), 4),
+            "risk_factors": list(RISK_COMBINATIONS[risks[i]]),
+            "error": None,
+        })
+        results.append(result)
+    return results
+
+
+class CsvResultWriter:
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, results):
+        for result in results:
+            row = dict(result)
+            row["risk_factors"] = "; ".join(result.get("risk_factors") or ())
+            self.writer.writerow(row)
+
+
+class NdjsonResultWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, results):
+        self.stream.writelines(json.dumps(result) + "\n" for result in results)
+
+
+WRITERS = {"csv": CsvResultWriter, "ndjson": NdjsonResultWriter}
+
+
+def score_stream(model, scaler, source, sink, input_format, output_format,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+    """Score every reading in `source` into `sink`; returns run statistics"""
+    writer = WRITERS[output_format](sink)
+    rows = failed = 0
+    statuses = dict.fromkeys(STATUS_NAMES.values(), 0)
+    started = time.perf_counter()
+    for chunk in iter_chunks(READERS[input_format](source), chunk_size):
+        results = score_chunk(model, scaler, chunk, rows)
+        writer.write(results)
+        rows += len(results)
+        for result in results:
+            if result.get("error") is not None:
+                failed += 1
+            else:
+                statuses[result["status"]] += 1
+    seconds = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "failed": failed,
+        "statuses": statuses,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+    }
@@ -0,0 +1,124 @@
+"""
+In-process LRU cache of model outputs keyed on quantized sensor readings
+
+Devices often resend the same, or nearly the same, reading. Each input is
+rounded to the sensor's real resolution before lookup, so repeats skip the
+scaler and forest entirely. Only the model output is cached; risk factors and
+the echoed input values are still computed from the exact reading.
+"""
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from .inference import FEATURES
+
+# Smallest meaningful step of each sensor, in input units
+DEFAULT_RESOLUTION = {
+    "voltage": 0.01,
+    "current": 1.0,
+    "temperature": 0.5,
+    "age_months": 1,
+    "resistance": 0.001,
+}
+
+
+def parse_resolution(spec, defaults=DEFAULT_RESOLUTION):
+    """Parse 'voltage=0.05,current=5' into a full per-field step mapping; steps must be positive"""
+    resolution = dict(defaults)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        field, _, step = item.partition("=")
+        if field.strip() not in resolution:
+            raise ValueError(f"Unknown field: {field.strip()}")
+        value = float(step)
+        # key() divides by every step, so a zero or non-finite one would fail each request
+        if not (value > 0 and math.isfinite(value)):
+            raise ValueError(f"Resolution of {field.strip()} must be a positive number, got {step!r}")
+        resolution[field.strip()] = value
+    return resolution
+
+
+class PredictionCache:
+    """Size-bounded LRU mapping quantized readings to (prediction, probabilities)
+
+    After clear(owner), only outputs of `owner` are stored, so a request that
+    was still scoring with the previous model cannot refill the cache with it.
+    """
+
+    def __init__(self, maxsize=10000, resolution=None):
+        self.maxsize = maxsize
+        resolution = resolution or DEFAULT_RESOLUTION
+        self.steps = tuple(float(resolution[field]) for field in FEATURES)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_bytes = 0
+        self.owner = None
+
+    def key(self, values):
+        return tuple(round(value / step) for value, step in zip(values, self.steps))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, prediction, probabilities, model=None):
+        """Store `model`'s output for `key`; ignored if the cache now belongs to another model"""
+        value = (int(prediction), tuple(float(p) for p in probabilities))
+        size = entry_size(key, value)
+        with self.lock:
+            if key in self.entries or (self.owner is not None and model is not self.owner):
+                return
+            self.entries[key] = (value, size)
+            self.memory_bytes += size
+            while len(self.entries) > self.maxsize:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.memory_bytes -= evicted
+
+    def clear(self, owner=None):
+        """Drop every entry, e.g. after the model behind them was replaced by `owner`"""
+        with self.lock:
+            self.entries.clear()
+            self.memory_bytes = 0
+            self.owner = owner
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_bytes": self.memory_bytes,
+            "resolution": dict(zip(FEATURES, self.steps)),
+        }
+
+
+def entry_size(key, value):
+    """Approximate bytes held by one cache entry, including the dict slot"""
+    prediction, probabilities = value
+    size = sys.getsizeof(key) + sum(sys.getsizeof(k) for k in key)
+    size += sys.getsizeof(value) + sys.getsizeof(prediction)
+    size += sys.getsizeof(probabilities) + sum(sys.getsizeof(p) for p in probabilities)
+    # OrderedDict keeps a hash-table slot and a linked-list node per entry
+    return size + 100
+
+
+def cache_from_env():
+    """Build the cache configured by BATTERY_CACHE_SIZE / BATTERY_CACHE_RESOLUTION
+
+    Returns None, leaving caching off, unless BATTERY_CACHE_SIZE is positive.
+    """
+    maxsize = int(os.environ.get("BATTERY_CACHE_SIZE", "0"))
+    if maxsize <= 0:
+        return None
+    return PredictionCache(maxsize, parse_resolution(os.environ.get("BATTERY_CACHE_RESOLUTION", "")))
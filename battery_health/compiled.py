@@ -0,0 +1,245 @@
+"""
+Pure-NumPy inference for the trained scaler and Random Forest
+
+The forest's trees and the scaler's parameters are flattened into one .npz
+archive by export_compiled(); load_compiled() rebuilds drop-in replacements
+for the scaler and model without importing scikit-learn. The same arrays can
+be saved as a directory of .npy files, which load_compiled() can memory-map.
+shrink_arrays() derives a smaller forest from the same arrays: fewer trees,
+a depth limit, float32 values and the narrowest integer index types.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Archive the handlers load; point it at an optimize_model.py output to serve that instead
+COMPILED_FILE = os.environ.get("BATTERY_COMPILED_FILE", "battery_forest.npz")
+OPTIMIZED_FILE = "battery_forest_small.npz"
+CHUNK_ROWS = 4096
+
+
+class CompiledScaler:
+    """StandardScaler.transform using the exported mean/scale arrays"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, features):
+        features = np.asarray(features, dtype=np.float64)
+        return (features - self.mean_) / self.scale_
+
+
+class CompiledForest:
+    """Random Forest predict/predict_proba over flattened tree arrays
+
+    All trees share one node table. Leaves point back at themselves, so every
+    tree can be walked in lockstep for max_depth steps without masking.
+    children[node] holds (right, left) so the comparison result indexes it.
+    """
+
+    def __init__(self, feature, threshold, children, leaf_proba, roots, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def apply(self, features):
+        """Return the leaf index reached in every tree, shape (n_rows, n_trees)"""
+        # The forest compares float32 inputs against float64 thresholds
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        n_rows, n_features = features.shape
+        flat = features.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        children = self.children.ravel()
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = flat[row_offsets + self.feature[nodes]] <= self.threshold[nodes]
+            nodes = children[nodes * 2 + go_left]
+        return nodes
+
+    def predict_proba(self, features):
+        features = np.asarray(features)
+        proba = np.zeros((len(features), len(self.classes_)))
+        for start in range(0, len(features), CHUNK_ROWS):
+            leaves = self.apply(features[start:start + CHUNK_ROWS])
+            chunk = proba[start:start + CHUNK_ROWS]
+            # Accumulate tree by tree, in estimator order, to match sklearn's sum
+            for tree in range(leaves.shape[1]):
+                chunk += self.leaf_proba[leaves[:, tree]]
+        proba /= len(self.roots)
+        return proba
+
+    def predict(self, features):
+        return self.classes_.take(np.argmax(self.predict_proba(features), axis=1))
+
+
+def flatten_forest(model):
+    """Flatten a fitted RandomForestClassifier into shared node arrays"""
+    n_classes = len(model.classes_)
+    features, thresholds, children, probas, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        index = np.arange(tree.node_count)
+        is_leaf = tree.children_left == -1
+        left = np.where(is_leaf, index, tree.children_left)
+        right = np.where(is_leaf, index, tree.children_right)
+        children.append(np.stack([right, left], axis=1) + offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+
+        # Same normalisation DecisionTreeClassifier.predict_proba applies
+        proba = tree.value[:, 0, :n_classes].copy()
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        probas.append(proba / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    return {
+        "feature": np.concatenate(features).astype(np.int32),
+        "threshold": np.concatenate(thresholds).astype(np.float64),
+        "children": np.concatenate(children).astype(np.int32),
+        "leaf_proba": np.concatenate(probas),
+        "roots": np.array(roots, dtype=np.int32),
+        "classes": np.asarray(model.classes_),
+        "max_depth": np.array(max_depth),
+    }
+
+
+def compiled_arrays(model, scaler=None):
+    """Return the flat arrays for a fitted or already compiled model/scaler pair"""
+    if isinstance(model, CompiledForest):
+        forest = {
+            "feature": model.feature,
+            "threshold": model.threshold,
+            "children": model.children,
+            "leaf_proba": model.leaf_proba,
+            "roots": model.roots,
+            "classes": model.classes_,
+            "max_depth": np.array(model.max_depth),
+        }
+    else:
+        forest = flatten_forest(model)
+    if scaler is None:
+        return forest
+    if isinstance(scaler, CompiledScaler):
+        return {"mean": scaler.mean_, "scale": scaler.scale_, **forest}
+    n_features = len(scaler.scale_) if scaler.scale_ is not None else len(scaler.mean_)
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return {"mean": mean, "scale": scale, **forest}
+
+
+def float32_floor(values):
+    """Largest float32 not above each value
+
+    Inputs are compared as float32, so for any float32 x, x <= t exactly when
+    x <= float32_floor(t): rounding thresholds down keeps every split intact.
+    """
+    rounded = np.asarray(values).astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+def shrink_arrays(arrays, trees=None, max_depth=None):
+    """Return compact forest arrays from compiled_arrays() output
+
+    Keeps the first `trees` trees, turns nodes at `max_depth` into leaves
+    that predict their training class distribution, drops unreachable nodes
+    and stores thresholds and probabilities as float32 with the smallest
+    integer types that fit. Scaler arrays, if present, are kept as they are.
+    """
+    children = arrays["children"]
+    roots = np.asarray(arrays["roots"])[:trees]
+    # Breadth-first walk, one tree level at a time across all kept trees
+    levels, leaf_flags = [], []
+    frontier = roots.astype(np.int64)
+    while frontier.size:
+        leaf = children[frontier, 0] == frontier
+        if max_depth is not None and len(levels) == max_depth:
+            leaf = np.ones_like(leaf)
+        levels.append(frontier)
+        leaf_flags.append(leaf)
+        frontier = children[frontier[~leaf]].ravel().astype(np.int64)
+    kept = np.concatenate(levels)
+    is_leaf = np.concatenate(leaf_flags)
+
+    new_index = np.empty(len(children), dtype=np.int64)
+    new_index[kept] = np.arange(len(kept))
+    new_children = np.where(is_leaf[:, None], np.arange(len(kept))[:, None], new_index[children[kept]])
+    # apply() indexes children with node * 2 + 1, which must fit the index type
+    index_type = np.uint16 if 2 * len(kept) + 1 <= np.iinfo(np.uint16).max else np.int32
+    n_features = int(arrays["feature"].max()) + 1
+    feature_type = np.uint8 if n_features <= np.iinfo(np.uint8).max else np.int32
+
+    shrunk = {name: arrays[name] for name in ("mean", "scale") if name in arrays}
+    shrunk.update({
+        "feature": np.where(is_leaf, 0, arrays["feature"][kept]).astype(feature_type),
+        "threshold": float32_floor(np.asarray(arrays["threshold"], dtype=np.float64)[kept]),
+        "children": new_children.astype(index_type),
+        "leaf_proba": np.asarray(arrays["leaf_proba"])[kept].astype(np.float32),
+        "roots": new_index[roots].astype(index_type),
+        "classes": arrays["classes"],
+        "max_depth": np.array(len(levels) - 1),
+    })
+    return shrunk
+
+
+def export_compiled(model, scaler, path):
+    """Write the scaler and forest to a single uncompressed .npz archive"""
+    np.savez(path, **compiled_arrays(model, scaler))
+
+
+def save_compiled_dir(model, scaler, directory):
+    """Write the arrays as one .npy file each so they can be memory-mapped
+
+    With scaler=None only the forest is written and load_compiled() returns
+    None for the scaler.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, array in compiled_arrays(model, scaler).items():
+        np.save(directory / f"{name}.npy", array)
+
+
+def load_compiled(path, mmap_mode=None):
+    """Load (model, scaler) stand-ins from export_compiled or save_compiled_dir output
+
+    `mmap_mode` applies to .npy directories, letting several processes share
+    one copy of the node arrays through the page cache. Archives with separate
+    children_left/children_right arrays, from before the packed layout, load too.
+    """
+    path = Path(path)
+    if path.is_dir():
+        arrays = {f.stem: np.load(f, mmap_mode=mmap_mode) for f in path.glob("*.npy")}
+    else:
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+    scaler = CompiledScaler(arrays.pop("mean"), arrays.pop("scale")) if "mean" in arrays else None
+    if "children" not in arrays and "children_left" in arrays:
+        # Archives exported before the children were packed store the two sides separately
+        arrays["children"] = np.stack([arrays.pop("children_right"), arrays.pop("children_left")], axis=1)
+    model = CompiledForest(
+        arrays["feature"],
+        arrays["threshold"],
+        arrays["children"],
+        arrays["leaf_proba"],
+        arrays["roots"],
+        arrays["classes"],
+        arrays["max_depth"],
+    )
+    return model, scaler
@@ -0,0 +1,255 @@
+"""
+Streaming drift and out-of-distribution monitoring of incoming readings
+
+DriftMonitor standardizes every scored reading with the reference mean and
+standard deviation (the scaler's, unless a reference file was built from the
+training data) and folds it into constant-size sketches: per-feature sums of
+z and z**2 and counts over fixed z bins. Each reading's OOD score is its
+largest |z|, which costs a handful of float operations. The summary compares
+the sketches with the reference: every feature's mean shift and spread ratio,
+and, when the reference histograms were measured on training data rather than
+assumed normal, the population stability index (PSI) of its histogram.
+
+When `window` readings have been seen every sketch is halved, so old traffic
+fades out and a recent shift is not diluted by months of normal readings.
+"""
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from .inference import FEATURES
+
+# Bins of width 0.5 standard deviations from -4 to 4, plus one tail bin on each side
+BIN_EDGES = np.linspace(-4.0, 4.0, 17)
+BIN_WIDTH = float(BIN_EDGES[1] - BIN_EDGES[0])
+N_BINS = len(BIN_EDGES) + 1
+LOWEST_EDGE = float(BIN_EDGES[0])
+LAST_BIN = N_BINS - 1
+DEFAULT_WINDOW = 10000
+DEFAULT_OOD_THRESHOLD = 4.0
+# Common rule of thumb: PSI above 0.2 is a significant population shift
+PSI_THRESHOLD = 0.2
+# Mean moved by half a reference standard deviation, or spread halved/doubled
+MEAN_SHIFT_THRESHOLD = 0.5
+STD_RATIO_RANGE = (0.5, 2.0)
+MIN_SUMMARY_READINGS = 100
+PSI_EPSILON = 1e-4
+REFERENCE_FILE = "battery_drift_reference.json"
+
+
+def normal_proportions():
+    """Share of a standard normal distribution in each bin"""
+    cdf = [0.0] + [0.5 * (1.0 + math.erf(edge / math.sqrt(2.0))) for edge in BIN_EDGES] + [1.0]
+    return np.diff(cdf)
+
+
+def scaler_reference(scaler):
+    """Reference statistics from a fitted StandardScaler or CompiledScaler
+
+    The scaler does not keep the training distribution's shape, so the
+    histogram proportions assume a normal distribution and are reported but
+    not used to flag drift.
+    """
+    n_features = len(FEATURES)
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    return {
+        "mean": np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64),
+        "std": np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64),
+        "proportions": np.tile(normal_proportions(), (n_features, 1)),
+        "source": "scaler",
+        "measured": False,
+    }
+
+
+def build_reference(features):
+    """Reference statistics measured on an n x 5 training feature matrix"""
+    features = np.asarray(features, dtype=np.float64)
+    mean = features.mean(axis=0)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    bins = bin_indices((features - mean) / std)
+    counts = np.stack([np.bincount(bins[:, j], minlength=N_BINS) for j in range(len(FEATURES))])
+    return {
+        "mean": mean,
+        "std": std,
+        "proportions": counts / len(features),
+        "source": "training data",
+        "measured": True,
+        "samples": len(features),
+    }
+
+
+def save_reference(reference, path):
+    payload = {key: value.tolist() if isinstance(value, np.ndarray) else value
+               for key, value in reference.items() if key not in ("source", "measured")}
+    payload["features"] = FEATURES
+    payload["bin_edges"] = BIN_EDGES.tolist()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+
+
+def load_reference(path):
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+    if payload.get("features") != FEATURES or payload.get("bin_edges") != BIN_EDGES.tolist():
+        raise ValueError(f"{path} was built for different features or bins")
+    return {
+        "mean": np.asarray(payload["mean"], dtype=np.float64),
+        "std": np.asarray(payload["std"], dtype=np.float64),
+        "proportions": np.asarray(payload["proportions"], dtype=np.float64),
+        "source": str(path),
+        "measured": True,
+        "samples": payload.get("samples"),
+    }
+
+
+def bin_indices(z):
+    """Bin index of every z value: 0 below -4, N_BINS - 1 at or above 4"""
+    return np.clip(np.floor((z - BIN_EDGES[0]) / BIN_WIDTH).astype(np.int64) + 1, 0, N_BINS - 1)
+
+
+def population_stability(observed, expected):
+    """PSI of each row of `observed` proportions against `expected`"""
+    observed = np.maximum(observed, PSI_EPSILON)
+    expected = np.maximum(expected, PSI_EPSILON)
+    return np.sum((observed - expected) * np.log(observed / expected), axis=-1)
+
+
+class DriftMonitor:
+    """Constant-memory sketches of the readings seen, compared with a reference"""
+
+    def __init__(self, reference, window=DEFAULT_WINDOW, ood_threshold=DEFAULT_OOD_THRESHOLD):
+        self.reference = reference
+        self.window = window
+        self.ood_threshold = ood_threshold
+        # Plain lists keep the per-reading update free of NumPy call overhead
+        self.mean = reference["mean"].tolist()
+        self.inverse_std = (1.0 / reference["std"]).tolist()
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            n_features = len(FEATURES)
+            self.count = 0.0
+            self.sum_z = [0.0] * n_features
+            self.sum_zz = [0.0] * n_features
+            self.bins = [[0.0] * N_BINS for _ in range(n_features)]
+            self.ood_count = 0.0
+            self.total = 0
+
+    def observe(self, values):
+        """Fold one validated reading into the sketches and return its OOD score"""
+        z = [(value - mean) * inverse_std for value, mean, inverse_std in zip(values, self.mean, self.inverse_std)]
+        score = max(max(z), -min(z))
+        with self.lock:
+            sum_z, sum_zz, bins = self.sum_z, self.sum_zz, self.bins
+            for j, z_j in enumerate(z):
+                sum_z[j] += z_j
+                sum_zz[j] += z_j * z_j
+                index = int((z_j - LOWEST_EDGE) // BIN_WIDTH) + 1
+                bins[j][0 if index < 0 else LAST_BIN if index > LAST_BIN else index] += 1
+            self.count += 1
+            self.total += 1
+            if score > self.ood_threshold:
+                self.ood_count += 1
+            if self.count >= self.window:
+                self._decay()
+        return round(score, 3)
+
+    def observe_batch(self, features):
+        """Fold an n x 5 matrix of validated readings in at once; returns their OOD scores"""
+        if len(features) == 0:
+            return np.zeros(0)
+        z = (np.asarray(features, dtype=np.float64) - self.reference["mean"]) / self.reference["std"]
+        scores = np.abs(z).max(axis=1)
+        bins = bin_indices(z)
+        sum_z = z.sum(axis=0).tolist()
+        sum_zz = np.einsum("ij,ij->j", z, z).tolist()
+        counts = [np.bincount(bins[:, j], minlength=N_BINS).tolist() for j in range(len(FEATURES))]
+        ood = int(np.count_nonzero(scores > self.ood_threshold))
+        with self.lock:
+            for j in range(len(FEATURES)):
+                self.sum_z[j] += sum_z[j]
+                self.sum_zz[j] += sum_zz[j]
+                self.bins[j][:] = [old + new for old, new in zip(self.bins[j], counts[j])]
+            self.count += len(features)
+            self.total += len(features)
+            self.ood_count += ood
+            while self.count >= self.window:
+                self._decay()
+        return np.round(scores, 3)
+
+    def _decay(self):
+        self.count /= 2
+        self.ood_count /= 2
+        for values in (self.sum_z, self.sum_zz, *self.bins):
+            values[:] = [value / 2 for value in values]
+
+    def summary(self):
+        """Per-feature drift statistics for the health endpoint"""
+        with self.lock:
+            count = self.count
+            sum_z = np.array(self.sum_z)
+            sum_zz = np.array(self.sum_zz)
+            bins = np.array(self.bins)
+            ood_count = self.ood_count
+            total = self.total
+        summary = {
+            "readings": total,
+            "reference": self.reference["source"],
+            "reference_histograms": "measured" if self.reference["measured"] else "normal",
+            "window": self.window,
+            "ood_threshold": self.ood_threshold,
+            "ood_rate": round(ood_count / count, 4) if count else 0.0,
+        }
+        if count < MIN_SUMMARY_READINGS:
+            summary["status"] = "warming_up"
+            return summary
+        mean_z = sum_z / count
+        std_z = np.sqrt(np.maximum(sum_zz / count - mean_z ** 2, 0.0))
+        psi = population_stability(bins / count, self.reference["proportions"])
+        measured = self.reference["measured"]
+        features = {}
+        for j, feature in enumerate(FEATURES):
+            drifting = (abs(mean_z[j]) > MEAN_SHIFT_THRESHOLD
+                        or not STD_RATIO_RANGE[0] < std_z[j] < STD_RATIO_RANGE[1]
+                        or (measured and psi[j] > PSI_THRESHOLD))
+            features[feature] = {
+                "mean": round(float(self.reference["mean"][j] + mean_z[j] * self.reference["std"][j]), 4),
+                "std": round(float(std_z[j] * self.reference["std"][j]), 4),
+                "reference_mean": round(float(self.reference["mean"][j]), 4),
+                "reference_std": round(float(self.reference["std"][j]), 4),
+                "mean_shift": round(float(mean_z[j]), 4),
+                "std_ratio": round(float(std_z[j]), 4),
+                "psi": round(float(psi[j]), 4),
+                "drifting": bool(drifting),
+            }
+        drifting = [feature for feature, stats in features.items() if stats["drifting"]]
+        summary["status"] = "drifting" if drifting else "stable"
+        summary["drifting_features"] = drifting
+        summary["features"] = features
+        return summary
+
+
+def drift_from_env(scaler, model_dir=None):
+    """Build a monitor for `scaler`, or None when BATTERY_DRIFT=0
+
+    BATTERY_DRIFT_REFERENCE (or battery_drift_reference.json in `model_dir`)
+    supplies training-data statistics in place of the scaler's.
+    """
+    if os.environ.get("BATTERY_DRIFT", "1") == "0":
+        return None
+    path = os.environ.get("BATTERY_DRIFT_REFERENCE")
+    if path is None and model_dir is not None and os.path.exists(os.path.join(model_dir, REFERENCE_FILE)):
+        path = os.path.join(model_dir, REFERENCE_FILE)
+    reference = load_reference(path) if path else scaler_reference(scaler)
+    return DriftMonitor(
+        reference,
+        int(os.environ.get("BATTERY_DRIFT_WINDOW", DEFAULT_WINDOW)),
+        float(os.environ.get("BATTERY_OOD_THRESHOLD", DEFAULT_OOD_THRESHOLD)),
+    )
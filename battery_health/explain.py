@@ -0,0 +1,125 @@
+"""
+Per-feature contributions to a forest's prediction from its decision paths
+
+Along a tree's decision path, every split moves the node's class distribution
+from the parent's to the child's; crediting that change to the split feature
+decomposes a leaf's probabilities into the root's distribution (the baseline)
+plus one contribution per feature. Averaged over the trees, the baseline and
+contributions add up exactly to the forest's predict_proba.
+
+A leaf's contributions depend only on its path, so Explainer computes them
+once for every leaf in the forest. Explaining a reading is then the same leaf
+lookup as a prediction plus one gather per tree, for single readings and
+batches alike.
+"""
+import threading
+import weakref
+
+import numpy as np
+
+from .compiled import CompiledForest, compiled_arrays
+from .inference import FEATURES, STATUS_NAMES, InvalidReading
+
+# Rows gathered at once are capped so rows x trees x features x classes stays near this many floats
+GATHER_ELEMENTS = 1 << 20
+
+
+def path_contributions(feature, children, node_values, roots, n_features):
+    """(leaf_rows, table): table[leaf_rows[node]] is a leaf's n_features x n_classes contributions"""
+    n_nodes = len(children)
+    node_values = np.asarray(node_values, dtype=np.float64)
+    contributions = np.zeros((n_nodes, n_features, node_values.shape[1]))
+    frontier = np.asarray(roots, dtype=np.int64)
+    # Top-down, one level at a time across all trees: a child inherits its parent's
+    # path sums plus the value change of the split that leads to it
+    while frontier.size:
+        pairs = children[frontier].astype(np.int64)
+        parents = frontier[pairs[:, 0] != frontier]
+        pairs = pairs[pairs[:, 0] != frontier]
+        split = feature[parents].astype(np.int64)
+        for child in (pairs[:, 0], pairs[:, 1]):
+            contributions[child] = contributions[parents]
+            contributions[child, split] += node_values[child] - node_values[parents]
+        frontier = pairs.ravel()
+    leaves = np.flatnonzero(children[:, 0] == np.arange(n_nodes))
+    leaf_rows = np.full(n_nodes, -1, dtype=np.int64)
+    leaf_rows[leaves] = np.arange(len(leaves))
+    return leaf_rows, contributions[leaves]
+
+
+class Explainer:
+    """Baseline and per-feature contributions for a fitted or compiled forest"""
+
+    def __init__(self, model):
+        if not (hasattr(model, "estimators_") or isinstance(model, CompiledForest)):
+            raise InvalidReading("Explanations need the Random Forest, not a lookup table", "explain_unsupported")
+        arrays = compiled_arrays(model)
+        self.forest = CompiledForest(**arrays)
+        self.classes = np.asarray(arrays["classes"])
+        node_values = np.asarray(arrays["leaf_proba"], dtype=np.float64)
+        self.baseline = node_values[np.asarray(arrays["roots"], dtype=np.int64)].mean(axis=0)
+        self.leaf_rows, self.table = path_contributions(
+            arrays["feature"], arrays["children"], node_values, arrays["roots"], len(FEATURES)
+        )
+
+    @property
+    def memory_bytes(self):
+        return self.table.nbytes + self.leaf_rows.nbytes
+
+    def contributions(self, features_scaled):
+        """Per-feature contributions to every class, shape (n_rows, n_features, n_classes)"""
+        features_scaled = np.asarray(features_scaled, dtype=np.float64)
+        n_trees = self.forest.n_estimators
+        result = np.zeros((len(features_scaled), *self.table.shape[1:]))
+        chunk_rows = max(1, GATHER_ELEMENTS // (n_trees * self.table[0].size))
+        for start in range(0, len(features_scaled), chunk_rows):
+            leaves = self.forest.apply(features_scaled[start:start + chunk_rows])
+            result[start:start + chunk_rows] = self.table[self.leaf_rows[leaves]].sum(axis=1)
+        result /= n_trees
+        return result
+
+    def explain(self, features_scaled, predictions):
+        """JSON-ready explanation of each row's predicted class, in percentage points"""
+        contributions = self.contributions(features_scaled)
+        class_index = np.searchsorted(self.classes, predictions)
+        rows = np.arange(len(class_index))
+        chosen = contributions[rows, :, class_index] * 100
+        baselines = self.baseline[class_index] * 100
+        explanations = []
+        for i, prediction in enumerate(predictions):
+            values = chosen[i]
+            # Features ordered by how far they moved the predicted class's probability
+            order = np.argsort(-np.abs(values), kind="stable")
+            explanations.append({
+                "class": STATUS_NAMES[int(prediction)],
+                "baseline": round(float(baselines[i]), 2),
+                "contributions": {FEATURES[j]: round(float(values[j]), 2) for j in range(len(FEATURES))},
+                "top_features": [FEATURES[j] for j in order[:2] if values[j] != 0],
+            })
+        return explanations
+
+
+_explainers = weakref.WeakKeyDictionary()
+_explainers_lock = threading.Lock()
+
+
+def explainer_for(model):
+    """The cached Explainer of `model`, built on first use"""
+    explainer = _explainers.get(model)
+    if explainer is None:
+        with _explainers_lock:
+            explainer = _explainers.get(model)
+            if explainer is None:
+                explainer = _explainers[model] = Explainer(model)
+    return explainer
+
+
+def explain_reading(model, scaler, values, prediction):
+    """Explanation of one validated reading's predicted class"""
+    features_scaled = scaler.transform(np.array([values], dtype=np.float64))
+    return explainer_for(model).explain(features_scaled, [prediction])[0]
+
+
+def explain_requested(body):
+    """True when a request body asks for explanations with "explain": true"""
+    return isinstance(body, dict) and body.get("explain") is True
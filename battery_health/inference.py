@@ -0,0 +1,154 @@
+"""
+Prediction core shared by the API handlers and the Gradio app
+
+Every entry point goes through predict_reading(): parse, validate, scale,
+predict, then attach risk factors and recommendations. The hot path works on
+plain tuples and a single 1 x 5 NumPy array; no pandas is involved.
+"""
+from time import perf_counter
+
+import numpy as np
+
+from .metrics import STATUS_NAMES
+from .rules import RANGE_RULES, RISK_COMBINATIONS, VALID, range_rule, risk_code
+
+FEATURES = ["voltage", "current", "temperature", "age_months", "resistance"]
+REQUIRED_FIELDS = ["voltage", "current", "temperature", "age_months"]
+DEFAULT_RESISTANCE = 0.03
+
+STATUS_EMOJI = {0: "✅", 1: "⚠️", 2: "❌"}
+RECOMMENDATIONS = {
+    0: ("Battery is in good condition",
+        "Regular maintenance recommended"),
+    1: ("Monitor battery performance closely",
+        "Consider replacement soon",
+        "Check charging system"),
+    2: ("Replace battery immediately",
+        "Do not rely on this battery",
+        "Check vehicle electrical system"),
+}
+
+
+class InvalidReading(ValueError):
+    """A reading that is missing fields, malformed or out of range
+
+    `reason` is a short machine-readable code, used to label error metrics.
+    """
+
+    def __init__(self, message, reason="invalid_request"):
+        super().__init__(message)
+        self.reason = reason
+
+
+def parse_reading(data):
+    """Return (voltage, current, temperature, age_months, resistance) from a request body"""
+    if not isinstance(data, dict):
+        raise InvalidReading("Reading must be an object", "not_an_object")
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise InvalidReading(f"Missing field: {field}", f"missing_{field}")
+    try:
+        return (
+            float(data['voltage']),
+            float(data['current']),
+            float(data['temperature']),
+            int(data['age_months']),
+            float(data.get('resistance', DEFAULT_RESISTANCE)),
+        )
+    except (ValueError, TypeError, OverflowError):
+        raise InvalidReading("Invalid number format in input", "invalid_number")
+
+
+def validate_reading(values):
+    """Raise InvalidReading with the first range violation, if any"""
+    index = range_rule(values)
+    if index != VALID:
+        column, _, _, message = RANGE_RULES[index]
+        raise InvalidReading(message, f"{FEATURES[column]}_out_of_range")
+
+
+def predict_with_proba(model, features_scaled):
+    """Return (predictions, probabilities) from a single forest traversal
+
+    Equivalent to calling model.predict() and model.predict_proba() but walks
+    the trees once: the class is the argmax of the probabilities, which is how
+    RandomForestClassifier.predict is defined.
+    """
+    probabilities = model.predict_proba(features_scaled)
+    predictions = model.classes_.take(np.argmax(probabilities, axis=1))
+    return predictions, probabilities
+
+
+def format_prediction(values, prediction, probabilities, risk=None):
+    """Build the JSON-ready response for one scored reading
+
+    `risk` is the reading's RISK_COMBINATIONS code when the caller already
+    computed it for a whole batch.
+    """
+    voltage, current, temperature, age_months, resistance = values
+    prediction = int(prediction)
+    if risk is None:
+        risk = risk_code(values)
+    return {
+        "status": f"{STATUS_NAMES[prediction]} {STATUS_EMOJI[prediction]}",
+        "prediction": prediction,
+        "confidence": round(float(probabilities[prediction]) * 100, 1),
+        "probabilities": {
+            "healthy": round(float(probabilities[0]) * 100, 1),
+            "weak": round(float(probabilities[1]) * 100, 1),
+            "failed": round(float(probabilities[2]) * 100, 1)
+        },
+        "risk_factors": list(RISK_COMBINATIONS[risk]),
+        "recommendations": list(RECOMMENDATIONS[prediction]),
+        "input_values": {
+            "voltage": voltage,
+            "current": current,
+            "temperature": temperature,
+            "age_months": age_months,
+            "resistance": resistance
+        }
+    }
+
+
+def score_reading(model, scaler, data, cache=None, metrics=None):
+    """Validate and score one request body; raises InvalidReading on bad input
+
+    Returns (values, prediction, probabilities, risk code). With a
+    PredictionCache, readings that quantize to a cached key reuse the stored
+    model output instead of running the scaler and forest. With Metrics, the
+    parse, validate, scale and inference stages are timed.
+    """
+    if metrics is not None:
+        started = perf_counter()
+    values = parse_reading(data)
+    if metrics is not None:
+        parsed = perf_counter()
+        metrics.observe("parse", parsed - started)
+    validate_reading(values)
+    risk = risk_code(values)
+    if metrics is not None:
+        validated = perf_counter()
+        metrics.observe("validate", validated - parsed)
+    if cache is not None:
+        key = cache.key(values)
+        cached = cache.get(key)
+        if cached is not None:
+            if metrics is not None:
+                metrics.count_prediction(cached[0])
+            return (values, *cached, risk)
+    features_scaled = scaler.transform(np.array([values], dtype=np.float64))
+    if metrics is not None:
+        scaled = perf_counter()
+        metrics.observe("scale", scaled - validated)
+    predictions, probabilities = predict_with_proba(model, features_scaled)
+    if metrics is not None:
+        metrics.observe("inference", perf_counter() - scaled)
+        metrics.count_prediction(predictions[0])
+    if cache is not None:
+        cache.put(key, predictions[0], probabilities[0], model)
+    return values, predictions[0], probabilities[0], risk
+
+
+def predict_reading(model, scaler, data, cache=None, metrics=None):
+    """Validate and score one request body into the JSON-ready response dict"""
+    return format_prediction(*score_reading(model, scaler, data, cache, metrics))
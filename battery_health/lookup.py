@@ -0,0 +1,117 @@
+"""
+Precomputed class-probability table over a grid of the validated input ranges
+
+build_lookup_table() evaluates the model once at every grid point and stores
+the probabilities as fixed-point uint16 in a .npy file, with the grid layout
+in a JSON sidecar. LookupForest memory-maps the table and answers
+predict_proba by rounding each reading to its nearest grid point and reading
+one row, an O(1) array access instead of a forest traversal.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .cache import parse_resolution
+from .inference import FEATURES
+from .rules import RANGE_RULES
+
+# Grid spacing per feature; voltage, age and resistance drive most predictions.
+# Two-month ages halve the table for about 0.2 points of class agreement;
+# a coarser resistance step costs twice that.
+DEFAULT_GRID_STEPS = {
+    "voltage": 0.05,
+    "current": 50.0,
+    "temperature": 10.0,
+    "age_months": 2,
+    "resistance": 0.005,
+}
+PROBABILITY_SCALE = np.iinfo(np.uint16).max
+BUILD_CHUNK_ROWS = 1 << 18
+
+
+def grid_layout(steps=None):
+    """Return (lows, steps, counts) for the grid spanning every RANGE_RULES range"""
+    steps = steps or DEFAULT_GRID_STEPS
+    lows, step_sizes, counts = [], [], []
+    for column, low, high, _ in sorted(RANGE_RULES):
+        step = float(steps[FEATURES[column]])
+        lows.append(float(low))
+        step_sizes.append(step)
+        counts.append(int(round((high - low) / step)) + 1)
+    return np.array(lows), np.array(step_sizes), np.array(counts)
+
+
+def sidecar_path(path):
+    return Path(path).with_suffix(".json")
+
+
+def build_lookup_table(model, scaler, path, steps=None):
+    """Evaluate the model at every grid point and write the table to `path` (.npy)"""
+    lows, step_sizes, counts = grid_layout(steps)
+    n_cells = int(np.prod(counts))
+    table = np.lib.format.open_memmap(
+        path, mode="w+", dtype=np.uint16, shape=(n_cells, len(model.classes_))
+    )
+    for start in range(0, n_cells, BUILD_CHUNK_ROWS):
+        cells = np.arange(start, min(start + BUILD_CHUNK_ROWS, n_cells))
+        features = lows + np.column_stack(np.unravel_index(cells, counts)) * step_sizes
+        proba = model.predict_proba(scaler.transform(features))
+        table[cells] = np.rint(proba * PROBABILITY_SCALE)
+    table.flush()
+    del table
+    sidecar_path(path).write_text(json.dumps({
+        "features": FEATURES,
+        "lows": lows.tolist(),
+        "steps": step_sizes.tolist(),
+        "counts": counts.tolist(),
+        "classes": np.asarray(model.classes_).tolist(),
+    }, indent=2))
+
+
+class IdentityScaler:
+    """The table is indexed by raw readings, so no scaling is applied"""
+
+    def transform(self, features):
+        return np.asarray(features, dtype=np.float64)
+
+
+class LookupForest:
+    """predict/predict_proba answered from a memory-mapped probability table"""
+
+    def __init__(self, table, lows, steps, counts, classes):
+        self.table = table
+        self.lows = lows
+        self.steps = steps
+        self.counts = counts
+        self.strides = np.append(np.cumprod(counts[:0:-1])[::-1], 1)
+        self.classes_ = classes
+
+    def cell_index(self, features):
+        grid = np.rint((np.asarray(features, dtype=np.float64) - self.lows) / self.steps)
+        grid = np.clip(grid, 0, self.counts - 1).astype(np.int64)
+        return grid @ self.strides
+
+    def predict_proba(self, features):
+        return self.table[self.cell_index(features)] / PROBABILITY_SCALE
+
+    def predict(self, features):
+        return self.classes_.take(np.argmax(self.predict_proba(features), axis=1))
+
+
+def load_lookup(path):
+    """Return (model, scaler) stand-ins backed by a table from build_lookup_table"""
+    layout = json.loads(sidecar_path(path).read_text())
+    model = LookupForest(
+        np.load(path, mmap_mode="r"),
+        np.array(layout["lows"]),
+        np.array(layout["steps"]),
+        np.array(layout["counts"]),
+        np.array(layout["classes"]),
+    )
+    return model, IdentityScaler()
+
+
+def parse_grid_steps(spec):
+    """Parse 'voltage=0.02,current=25' over DEFAULT_GRID_STEPS"""
+    return parse_resolution(spec, DEFAULT_GRID_STEPS)
@@ -0,0 +1,143 @@
+"""
+Request metrics in the Prometheus text exposition format
+
+Metrics keeps a fixed-bucket latency histogram per request stage, response
+counters by status code, validation-error counters by reason, the
+distribution of predicted classes and admission-control counters. It only needs the standard library, so
+handlers can create it before the model and NumPy load. Set BATTERY_METRICS=0
+to turn collection off; callers then hold None and skip every timer call.
+"""
+import os
+import threading
+from bisect import bisect_left
+
+# Upper bounds in seconds; request stages sit in the tens of microseconds to milliseconds
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+STAGES = ("decode", "parse", "validate", "scale", "inference", "serialize", "batch", "projection", "total")
+# Predicted class names; defined here so rendering them needs no NumPy, and re-exported by .inference
+STATUS_NAMES = {0: "Healthy", 1: "Weak", 2: "Failed"}
+
+
+class Histogram:
+    """Cumulative-on-render histogram over fixed LATENCY_BUCKETS"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile; inf if it is the overflow"""
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target:
+                return bound
+        return float("inf")
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    """Thread-safe stage histograms and outcome counters for one process"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.stages = {stage: Histogram(buckets) for stage in STAGES}
+        self.responses = {}
+        self.validation_errors = {}
+        self.predictions = {}
+        self.coalesced = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].observe(seconds)
+
+    def count_response(self, status):
+        with self.lock:
+            self.responses[status] = self.responses.get(status, 0) + 1
+
+    def count_rejected(self, reason):
+        """Count a request rejected with InvalidReading, labelled by its reason"""
+        with self.lock:
+            self.validation_errors[reason] = self.validation_errors.get(reason, 0) + 1
+
+    def count_prediction(self, prediction):
+        with self.lock:
+            self.predictions[int(prediction)] = self.predictions.get(int(prediction), 0) + 1
+
+    def count_predictions(self, predictions):
+        with self.lock:
+            for prediction in predictions:
+                self.predictions[int(prediction)] = self.predictions.get(int(prediction), 0) + 1
+
+    def count_coalesced(self):
+        """Count a request answered with another in-flight request's result"""
+        with self.lock:
+            self.coalesced += 1
+
+    def count_rate_limited(self):
+        with self.lock:
+            self.rate_limited += 1
+
+    def render(self):
+        """Return every metric as Prometheus text exposition format"""
+        with self.lock:
+            lines = [
+                "# HELP battery_stage_seconds Time spent in each request stage",
+                "# TYPE battery_stage_seconds histogram",
+            ]
+            for stage, histogram in self.stages.items():
+                for bound, count in histogram.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'battery_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+                lines.append(f'battery_stage_seconds_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'battery_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines += [
+                "# HELP battery_responses_total Responses by HTTP status code",
+                "# TYPE battery_responses_total counter",
+            ]
+            for status, count in sorted(self.responses.items()):
+                lines.append(f'battery_responses_total{{status="{status}"}} {count}')
+            lines += [
+                "# HELP battery_validation_errors_total Rejected requests by validation error",
+                "# TYPE battery_validation_errors_total counter",
+            ]
+            for reason, count in sorted(self.validation_errors.items()):
+                lines.append(f'battery_validation_errors_total{{reason="{reason}"}} {count}')
+            lines += [
+                "# HELP battery_predictions_total Predicted battery health classes",
+                "# TYPE battery_predictions_total counter",
+            ]
+            for prediction, count in sorted(self.predictions.items()):
+                lines.append(f'battery_predictions_total{{class="{STATUS_NAMES[prediction]}"}} {count}')
+            lines += [
+                "# HELP battery_coalesced_requests_total Requests that shared an identical in-flight request's result",
+                "# TYPE battery_coalesced_requests_total counter",
+                f"battery_coalesced_requests_total {self.coalesced}",
+                "# HELP battery_rate_limited_requests_total Requests rejected with 429 by the per-client rate limit",
+                "# TYPE battery_rate_limited_requests_total counter",
+                f"battery_rate_limited_requests_total {self.rate_limited}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def metrics_from_env():
+    """Build the process Metrics, or None when BATTERY_METRICS=0 turns them off"""
+    if os.environ.get("BATTERY_METRICS", "1") == "0":
+        return None
+    return Metrics()
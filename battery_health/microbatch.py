@@ -0,0 +1,89 @@
+"""
+Micro-batching of concurrent single-reading predictions for async servers
+
+Callers await MicroBatcher.submit() with one validated reading. A collector
+task groups waiting readings into a batch, closing it once max_batch_size
+readings are waiting or max_wait_ms has passed since the first one arrived,
+then runs one vectorized scale + predict_proba call in a worker thread and
+resolves every caller's future with its own row.
+"""
+import asyncio
+
+import numpy as np
+
+from .inference import predict_with_proba
+
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT_MS = 2.0
+
+
+class MicroBatcher:
+    def __init__(self, model, scaler, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS):
+        self.model = model
+        self.scaler = scaler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.task = None
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self._collect())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def submit(self, values):
+        """Return (prediction, probabilities) for one validated reading"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((values, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(pending) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Scoring runs in a thread so the event loop keeps accepting requests
+            features = np.array([values for values, _ in pending], dtype=np.float64)
+            try:
+                predictions, probabilities = await loop.run_in_executor(None, self._score, features)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(pending)
+            for i, (_, future) in enumerate(pending):
+                if not future.done():
+                    future.set_result((predictions[i], probabilities[i]))
+
+    def _score(self, features):
+        return predict_with_proba(self.model, self.scaler.transform(features))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+        }
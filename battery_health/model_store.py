@@ -0,0 +1,137 @@
+"""
+Local, hash-verified cache of the model artifacts published on Hugging Face
+
+The first process to start resolves the requested revision to a commit sha,
+downloads the artifacts and records their SHA-256 digests in a manifest.
+Later processes find the manifest, re-check the digests and load straight
+from disk without contacting the hub.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+REPO_ID = "nitin-y2309/battery_health"
+MODEL_FILE = "battery_model.pkl"
+SCALER_FILE = "battery_scaler.pkl"
+
+DEFAULT_REVISION = os.environ.get("BATTERY_MODEL_REVISION", "main")
+DEFAULT_CACHE_DIR = os.environ.get("BATTERY_MODEL_CACHE", "/tmp/battery_health_models")
+
+
+class ModelStoreError(Exception):
+    """Raised when the artifacts cannot be fetched or fail verification"""
+
+
+class HuggingFaceHub:
+    """Thin wrapper over huggingface_hub, imported only when the hub is needed"""
+
+    def resolve(self, repo_id, revision):
+        """Return (commit sha, {filename: lfs sha256 or None}) for a revision"""
+        from huggingface_hub import HfApi
+
+        info = HfApi().model_info(repo_id, revision=revision, files_metadata=True)
+        hashes = {s.rfilename: (s.lfs.sha256 if s.lfs else None) for s in info.siblings}
+        return info.sha, hashes
+
+    def download(self, repo_id, filename, revision):
+        from huggingface_hub import hf_hub_download
+
+        return hf_hub_download(repo_id=repo_id, filename=filename, revision=revision)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_offline():
+    return os.environ.get("HF_HUB_OFFLINE", "0").lower() in ("1", "true", "yes")
+
+
+class ModelStore:
+    """Resolve, download and verify model artifacts for one repo revision"""
+
+    def __init__(self, repo_id=REPO_ID, revision=None, cache_dir=None, offline=None, hub=None):
+        self.repo_id = repo_id
+        self.revision = revision or DEFAULT_REVISION
+        self.root = Path(cache_dir or DEFAULT_CACHE_DIR) / repo_id.replace("/", "--")
+        self.offline = is_offline() if offline is None else offline
+        self.hub = hub or HuggingFaceHub()
+        self.sha = None
+        self.source = None
+
+    @property
+    def manifest_path(self):
+        return self.root / f"{self.revision.replace('/', '--')}.json"
+
+    def fetch(self, filenames, optional=()):
+        """Return {filename: local path} for the required and available optional files"""
+        paths = self._from_disk(filenames, optional)
+        if paths is not None:
+            self.source = "disk"
+            return paths
+        if self.offline:
+            raise ModelStoreError(
+                f"{self.repo_id}@{self.revision} is not cached in {self.root} and hub access is offline"
+            )
+        self.source = "hub"
+        return self._from_hub(filenames, optional)
+
+    def _read_manifest(self):
+        try:
+            return json.loads(self.manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _from_disk(self, filenames, optional):
+        manifest = self._read_manifest()
+        if manifest is None:
+            return None
+        wanted = list(filenames) + [f for f in optional if f in manifest["repo_files"]]
+        paths = {}
+        for filename in wanted:
+            path = self.root / manifest["sha"] / filename
+            expected = manifest["files"].get(filename)
+            if expected is None or not path.exists() or file_sha256(path) != expected:
+                return None
+            paths[filename] = path
+        self.sha = manifest["sha"]
+        return paths
+
+    def _from_hub(self, filenames, optional):
+        sha, hub_hashes = self.hub.resolve(self.repo_id, self.revision)
+        missing = [f for f in filenames if f not in hub_hashes]
+        if missing:
+            raise ModelStoreError(f"{self.repo_id}@{sha} has no file {missing[0]}")
+
+        target = self.root / sha
+        target.mkdir(parents=True, exist_ok=True)
+        # Keep digests of files fetched earlier for the same commit
+        manifest = self._read_manifest()
+        digests = manifest["files"] if manifest and manifest["sha"] == sha else {}
+        paths = {}
+        for filename in list(filenames) + [f for f in optional if f in hub_hashes]:
+            downloaded = self.hub.download(self.repo_id, filename, sha)
+            digest = file_sha256(downloaded)
+            expected = hub_hashes[filename]
+            if expected is not None and digest != expected:
+                raise ModelStoreError(f"{filename} failed integrity check: {digest} != {expected}")
+            # Copy under a temporary name so a crash never leaves a partial artifact
+            partial = target / f".{filename}.partial"
+            shutil.copyfile(downloaded, partial)
+            os.replace(partial, target / filename)
+            digests[filename] = digest
+            paths[filename] = target / filename
+
+        manifest = {"repo_id": self.repo_id, "revision": self.revision, "sha": sha,
+                    "files": digests, "repo_files": sorted(hub_hashes)}
+        partial = self.manifest_path.with_suffix(".partial")
+        partial.write_text(json.dumps(manifest, indent=2))
+        os.replace(partial, self.manifest_path)
+        self.sha = sha
+        return paths
@@ -0,0 +1,272 @@
+"""
+Append-only columnar store of scored predictions with zone-map pruning
+
+Rows are buffered in memory and sealed into immutable chunks, one typed .npy
+file per column, so queries memory-map only the columns they touch. An
+index.json beside the chunks records every chunk's row count and per-column
+min/max; a query skips any chunk whose ranges cannot match before opening it,
+then filters the rest with vectorized comparisons.
+
+A store directory has a single writer; open it read-only elsewhere by never
+calling append().
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .inference import FEATURES, InvalidReading
+
+COLUMNS = {
+    "timestamp": np.float64,
+    "voltage": np.float64,
+    "current": np.float64,
+    "temperature": np.float64,
+    "age_months": np.int32,
+    "resistance": np.float64,
+    "prediction": np.int8,
+    "p_healthy": np.float32,
+    "p_weak": np.float32,
+    "p_failed": np.float32,
+    "confidence": np.float32,
+}
+PROBABILITY_COLUMNS = ["p_healthy", "p_weak", "p_failed"]
+INDEX_FILE = "index.json"
+DEFAULT_CHUNK_ROWS = 16384
+# Seal a partly filled chunk after this long so short-lived instances lose little
+DEFAULT_FLUSH_SECONDS = 60.0
+DEFAULT_QUERY_LIMIT = 1000
+
+
+class PredictionStore:
+    """Columnar prediction log in `directory`, appended in chunks of `chunk_rows`"""
+
+    def __init__(self, directory, chunk_rows=DEFAULT_CHUNK_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.chunk_rows = chunk_rows
+        self.flush_seconds = flush_seconds
+        index_path = self.directory / INDEX_FILE
+        self.chunks = json.loads(index_path.read_text())["chunks"] if index_path.exists() else []
+        self.buffer = {column: np.empty(chunk_rows, dtype=dtype) for column, dtype in COLUMNS.items()}
+        self.buffered = 0
+        self.buffer_started = None
+        self.lock = threading.Lock()
+        self.closed = threading.Event()
+        self.flusher = None
+
+    def append(self, features, predictions, probabilities, timestamps=None):
+        """Append n scored rows: an n x 5 feature matrix, n classes and n x 3 probabilities"""
+        features = np.asarray(features, dtype=np.float64).reshape(-1, len(FEATURES))
+        if not len(features):
+            return
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(len(features), -1)
+        if timestamps is None:
+            timestamps = np.full(len(features), time.time())
+        rows = {"timestamp": timestamps, "prediction": predictions, "confidence": probabilities.max(axis=1)}
+        rows.update((field, features[:, i]) for i, field in enumerate(FEATURES))
+        rows.update((column, probabilities[:, i]) for i, column in enumerate(PROBABILITY_COLUMNS))
+        with self.lock:
+            start = 0
+            while start < len(features):
+                take = min(len(features) - start, self.chunk_rows - self.buffered)
+                for column, values in rows.items():
+                    self.buffer[column][self.buffered:self.buffered + take] = values[start:start + take]
+                start += take
+                self._advance(take)
+
+    def append_one(self, values, prediction, probabilities, timestamp=None):
+        """Append a single scored reading as returned by score_reading()"""
+        probabilities = [float(p) for p in probabilities]
+        # Same order as COLUMNS; element writes avoid building arrays for one row
+        row = (time.time() if timestamp is None else timestamp, *values, int(prediction), *probabilities, max(probabilities))
+        with self.lock:
+            for column, value in zip(self.buffer.values(), row):
+                column[self.buffered] = value
+            self._advance(1)
+
+    def _advance(self, rows):
+        if self.buffer_started is None:
+            self.buffer_started = time.monotonic()
+        self.buffered += rows
+        if self.buffered == self.chunk_rows or time.monotonic() - self.buffer_started >= self.flush_seconds:
+            self._seal()
+
+    def flush(self):
+        """Seal any buffered rows into a chunk"""
+        with self.lock:
+            if self.buffered:
+                self._seal()
+
+    def flush_stale(self):
+        """Seal the buffer if its oldest row has waited `flush_seconds`"""
+        with self.lock:
+            if self.buffered and time.monotonic() - self.buffer_started >= self.flush_seconds:
+                self._seal()
+
+    def start_flusher(self):
+        """Seal stale buffers from a background thread, so quiet periods don't hold rows back"""
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self._flush_periodically, name="prediction-store-flush", daemon=True)
+            self.flusher.start()
+
+    def _flush_periodically(self):
+        # Checking twice per interval seals a buffer at most 1.5 x flush_seconds after its first row
+        while not self.closed.wait(self.flush_seconds / 2):
+            try:
+                self.flush_stale()
+            except OSError as e:
+                print(f"Prediction store flush failed: {e}")
+
+    def close(self):
+        """Stop the flusher and seal what is buffered; call at shutdown so the tail isn't lost"""
+        self.closed.set()
+        self.flush()
+
+    def _seal(self):
+        name = f"chunk-{len(self.chunks):06d}"
+        chunk_dir = self.directory / name
+        chunk_dir.mkdir(exist_ok=True)
+        entry = {"name": name, "rows": self.buffered, "min": {}, "max": {}}
+        for column, values in self.buffer.items():
+            values = values[:self.buffered]
+            np.save(chunk_dir / f"{column}.npy", values)
+            entry["min"][column] = values.min().item()
+            entry["max"][column] = values.max().item()
+        self.chunks.append(entry)
+        # Swap the index in atomically so readers never see a half-written chunk list
+        tmp_path = self.directory / f"{INDEX_FILE}.tmp"
+        tmp_path.write_text(json.dumps({"chunks": self.chunks}))
+        os.replace(tmp_path, self.directory / INDEX_FILE)
+        self.buffered = 0
+        self.buffer_started = None
+
+    def query(self, prediction=None, min_probability=None, ranges=None, limit=DEFAULT_QUERY_LIMIT):
+        """Return matching rows as {"count", "chunks_scanned", "chunks_skipped", "rows"}
+
+        `min_probability` applies to the probability of `prediction` when a
+        class is given, otherwise to the predicted class's confidence.
+        `ranges` maps column names to inclusive (low, high) bounds, either of
+        which may be None. At most `limit` rows are returned; `count` is the
+        full number of matches.
+        """
+        bounds = dict(ranges or {})
+        for column in bounds:
+            if column not in COLUMNS:
+                raise InvalidReading(f"Unknown column: {column}", "invalid_query")
+        if prediction is not None:
+            bounds["prediction"] = (prediction, prediction)
+        if min_probability is not None:
+            column = "confidence" if prediction is None else PROBABILITY_COLUMNS[prediction]
+            low, high = bounds.get(column, (None, None))
+            bounds[column] = (min_probability if low is None else max(low, min_probability), high)
+
+        with self.lock:
+            chunks = list(self.chunks)
+            pending = {column: values[:self.buffered].copy() for column, values in self.buffer.items()}
+        matches, count, skipped = [], 0, 0
+        for chunk in chunks:
+            if not chunk_may_match(chunk, bounds):
+                skipped += 1
+                continue
+            chunk_dir = self.directory / chunk["name"]
+            count += self._collect(
+                lambda column: np.load(chunk_dir / f"{column}.npy", mmap_mode="r"),
+                chunk["rows"], bounds, matches, limit
+            )
+        count += self._collect(pending.get, len(pending["prediction"]), bounds, matches, limit)
+        rows = [dict(zip(part, row)) for part in matches for row in zip(*(v.tolist() for v in part.values()))]
+        return {
+            "count": count,
+            "chunks_scanned": len(chunks) - skipped,
+            "chunks_skipped": skipped,
+            "rows": rows,
+        }
+
+    @staticmethod
+    def _collect(load, n_rows, bounds, matches, limit):
+        """Filter one chunk, keeping matches until `limit` rows are held; returns the match count"""
+        mask = np.ones(n_rows, dtype=bool)
+        for column, (low, high) in bounds.items():
+            values = load(column)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+        selected = np.flatnonzero(mask)
+        remaining = limit - sum(len(part["prediction"]) for part in matches)
+        if remaining > 0 and len(selected):
+            # Only now read the remaining columns, and only the selected rows
+            matches.append({column: np.asarray(load(column)[selected[:remaining]]) for column in COLUMNS})
+        return len(selected)
+
+    def stats(self):
+        return {
+            "chunks": len(self.chunks),
+            "rows": sum(chunk["rows"] for chunk in self.chunks) + self.buffered,
+            "buffered": self.buffered,
+            "directory": str(self.directory),
+        }
+
+
+def chunk_may_match(chunk, bounds):
+    """False when a chunk's min/max index rules out every row for `bounds`"""
+    for column, (low, high) in bounds.items():
+        if low is not None and chunk["max"][column] < low:
+            return False
+        if high is not None and chunk["min"][column] > high:
+            return False
+    return True
+
+
+def parse_query(params):
+    """Turn query-string parameters into PredictionStore.query() arguments
+
+    Accepts `prediction`, `min_probability`, `limit` and `<column>_min` /
+    `<column>_max` for any stored column, e.g. `age_months_min=48`.
+    """
+    kwargs = {"ranges": {}}
+    try:
+        for key, value in params.items():
+            if key == "prediction":
+                kwargs["prediction"] = int(value)
+                if kwargs["prediction"] not in range(len(PROBABILITY_COLUMNS)):
+                    raise InvalidReading("Prediction must be 0, 1 or 2", "invalid_query")
+            elif key == "min_probability":
+                kwargs["min_probability"] = float(value)
+            elif key == "limit":
+                kwargs["limit"] = max(0, int(value))
+            elif key.endswith(("_min", "_max")) and key[:-4] in COLUMNS:
+                low, high = kwargs["ranges"].get(key[:-4], (None, None))
+                if key.endswith("_min"):
+                    low = float(value)
+                else:
+                    high = float(value)
+                kwargs["ranges"][key[:-4]] = (low, high)
+            else:
+                raise InvalidReading(f"Unknown query parameter: {key}", "invalid_query")
+    except InvalidReading:
+        raise
+    except (ValueError, TypeError):
+        raise InvalidReading("Invalid number format in query", "invalid_query")
+    return kwargs
+
+
+def store_from_env():
+    """Open the store at BATTERY_PREDICTION_STORE with its background flusher, or None when it is unset
+
+    Callers should close() it at shutdown to seal the rows still buffered.
+    """
+    directory = os.environ.get("BATTERY_PREDICTION_STORE")
+    if not directory:
+        return None
+    store = PredictionStore(
+        directory,
+        int(os.environ.get("BATTERY_PREDICTION_STORE_CHUNK_ROWS", DEFAULT_CHUNK_ROWS)),
+        float(os.environ.get("BATTERY_PREDICTION_STORE_FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS)),
+    )
+    store.start_flusher()
+    return store
@@ -0,0 +1,225 @@
+"""
+Remaining-useful-life projection over the trained classifier
+
+The model only classifies a battery as it is now. To project forward, each
+reading is aged month by month over a horizon while its internal resistance
+grows along one or more scenarios (Ω per month); voltage, current and
+temperature stay as measured. Every (reading, scenario, month) row of that
+sweep is scored in one batched predict_proba call, and the first month where
+the probability of being at least Weak, or of being Failed, reaches its
+threshold is reported per scenario.
+
+Ages and resistances are capped at the top of the validated input ranges, so
+the model is never asked about batteries outside what it was trained on.
+"""
+import math
+
+import numpy as np
+
+from .batch import MAX_BATCH_SIZE, parse_readings, validate_ranges
+from .inference import FEATURES, STATUS_EMOJI, STATUS_NAMES, InvalidReading, parse_reading, validate_reading
+from .rules import RANGE_RULES
+
+DEFAULT_HORIZON_MONTHS = 60
+MAX_HORIZON_MONTHS = 240
+# Ω per month; a 0.03Ω battery reaches 0.09Ω after five years on "expected"
+DEFAULT_GROWTH = {"slow": 0.0005, "expected": 0.001, "fast": 0.002}
+DEFAULT_THRESHOLDS = {"weak": 0.5, "failed": 0.5}
+MAX_SCENARIOS = 8
+# Sweep rows one API request may score; scripts can project any number in chunks
+MAX_PROJECTION_ROWS = 250000
+CHUNK_ROWS = 65536
+
+_AGE = FEATURES.index("age_months")
+_RESISTANCE = FEATURES.index("resistance")
+AGE_LIMIT = next(rule[2] for rule in RANGE_RULES if rule[0] == _AGE)
+RESISTANCE_LIMIT = next(rule[2] for rule in RANGE_RULES if rule[0] == _RESISTANCE)
+WEAK, FAILED = 1, 2
+
+
+def _number(value, field):
+    if isinstance(value, bool):
+        raise InvalidReading(f"Field '{field}' must be a number", "invalid_projection")
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        raise InvalidReading(f"Field '{field}' must be a number", "invalid_projection")
+    if not math.isfinite(number):
+        raise InvalidReading(f"Field '{field}' must be a number", "invalid_projection")
+    return number
+
+
+def parse_projection_options(body):
+    """Return (months, scenarios, thresholds) from a request body's projection fields
+
+    `months` are the offsets swept from now, `scenarios` a list of
+    (name, resistance growth per month) and `thresholds` a dict with the
+    "weak" and "failed" probabilities that count as reaching that state.
+    """
+    body = body if isinstance(body, dict) else {}
+    horizon = _number(body.get("horizon_months", DEFAULT_HORIZON_MONTHS), "horizon_months")
+    step = _number(body.get("step_months", 1), "step_months")
+    if not (1 <= horizon <= MAX_HORIZON_MONTHS) or horizon != int(horizon):
+        raise InvalidReading(f"Field 'horizon_months' must be a whole number from 1 to {MAX_HORIZON_MONTHS}",
+                             "invalid_projection")
+    if not (1 <= step <= horizon) or step != int(step):
+        raise InvalidReading("Field 'step_months' must be a whole number from 1 to horizon_months",
+                             "invalid_projection")
+    months = np.arange(0, int(horizon) + 1, int(step))
+
+    growth = body.get("resistance_growth_per_month", DEFAULT_GROWTH)
+    if not isinstance(growth, dict):
+        growth = {"given": growth}
+    if not growth or len(growth) > MAX_SCENARIOS:
+        raise InvalidReading(f"Give between 1 and {MAX_SCENARIOS} resistance growth scenarios", "invalid_projection")
+    scenarios = []
+    for name, rate in growth.items():
+        rate = _number(rate, "resistance_growth_per_month")
+        if rate < 0:
+            raise InvalidReading("Resistance growth must not be negative", "invalid_projection")
+        scenarios.append((str(name), rate))
+
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    given = body.get("thresholds", {})
+    if not isinstance(given, dict) or set(given) - set(DEFAULT_THRESHOLDS):
+        raise InvalidReading("Field 'thresholds' may only set 'weak' and 'failed'", "invalid_projection")
+    for state, value in given.items():
+        value = _number(value, f"thresholds.{state}")
+        if not 0 < value <= 1:
+            raise InvalidReading("Thresholds must be probabilities in (0, 1]", "invalid_projection")
+        thresholds[state] = value
+    return months, scenarios, thresholds
+
+
+def sweep_features(features, months, rates):
+    """Feature rows for every reading x scenario x month, shape (n * S * M, 5)"""
+    features = np.asarray(features, dtype=np.float64)
+    grid = np.broadcast_to(features[:, None, None, :], (len(features), len(rates), len(months), features.shape[1])).copy()
+    grid[..., _AGE] = np.minimum(features[:, None, None, _AGE] + months, AGE_LIMIT)
+    growth = np.asarray(rates, dtype=np.float64)[:, None] * months
+    grid[..., _RESISTANCE] = np.minimum(features[:, None, None, _RESISTANCE] + growth, RESISTANCE_LIMIT)
+    return grid.reshape(-1, features.shape[1])
+
+
+def first_crossing(reached):
+    """Index of the first True along the last axis, -1 where there is none"""
+    return np.where(reached.any(axis=-1), reached.argmax(axis=-1), -1)
+
+
+def project_features(model, scaler, features, months, rates, thresholds, chunk_rows=CHUNK_ROWS):
+    """Sweep and score validated readings; returns arrays describing each projection
+
+    current: (n, classes) probabilities now; weak, failed: (n, S) index into
+    `months` of the first crossing or -1; at_horizon: (n, S) failure
+    probability at the last month. Readings are scored in chunks of about
+    `chunk_rows` sweep rows, one predict_proba call each.
+    """
+    features = np.asarray(features, dtype=np.float64)
+    n, n_scenarios, n_months = len(features), len(rates), len(months)
+    class_index = np.searchsorted(model.classes_, [WEAK, FAILED])
+    current = np.zeros((n, len(model.classes_)))
+    weak = np.full((n, n_scenarios), -1)
+    failed = np.full((n, n_scenarios), -1)
+    at_horizon = np.zeros((n, n_scenarios))
+    per_chunk = max(1, chunk_rows // (n_scenarios * n_months))
+    for start in range(0, n, per_chunk):
+        chunk = features[start:start + per_chunk]
+        rows = sweep_features(chunk, months, rates)
+        probabilities = model.predict_proba(scaler.transform(rows)).reshape(len(chunk), n_scenarios, n_months, -1)
+        p_failed = probabilities[..., class_index[1]]
+        p_weak_or_worse = probabilities[..., class_index[0]] + p_failed
+        current[start:start + len(chunk)] = probabilities[:, 0, 0]
+        weak[start:start + len(chunk)] = first_crossing(p_weak_or_worse >= thresholds["weak"])
+        failed[start:start + len(chunk)] = first_crossing(p_failed >= thresholds["failed"])
+        at_horizon[start:start + len(chunk)] = p_failed[..., -1]
+    return {"current": current, "weak": weak, "failed": failed, "at_horizon": at_horizon}
+
+
+def format_projection(age_months, months, scenarios, thresholds, projected, i):
+    """JSON-ready projection of reading `i` from project_features() output"""
+    age_months = int(age_months)
+    probabilities = projected["current"][i]
+    prediction = int(np.argmax(probabilities))
+    results = []
+    for s, (name, rate) in enumerate(scenarios):
+        weak, failed = int(projected["weak"][i, s]), int(projected["failed"][i, s])
+        weak_in = int(months[weak]) if weak >= 0 else None
+        failed_in = int(months[failed]) if failed >= 0 else None
+        results.append({
+            "scenario": name,
+            "resistance_growth_per_month": rate,
+            "months_until_weak": weak_in,
+            "weak_at_age_months": min(age_months + weak_in, AGE_LIMIT) if weak_in is not None else None,
+            "months_until_failed": failed_in,
+            "failed_at_age_months": min(age_months + failed_in, AGE_LIMIT) if failed_in is not None else None,
+            "failure_probability_at_horizon": round(float(projected["at_horizon"][i, s]) * 100, 1),
+        })
+    return {
+        "current": {
+            "status": f"{STATUS_NAMES[prediction]} {STATUS_EMOJI[prediction]}",
+            "prediction": prediction,
+            "probabilities": {
+                "healthy": round(float(probabilities[0]) * 100, 1),
+                "weak": round(float(probabilities[1]) * 100, 1),
+                "failed": round(float(probabilities[2]) * 100, 1),
+            },
+        },
+        "horizon_months": int(months[-1]),
+        "horizon_age_months": min(age_months + int(months[-1]), AGE_LIMIT),
+        "thresholds": thresholds,
+        "scenarios": results,
+    }
+
+
+def check_projection_size(readings, months, scenarios):
+    rows = readings * len(months) * len(scenarios)
+    if rows > MAX_PROJECTION_ROWS:
+        raise InvalidReading(
+            f"Projection needs {rows} model rows, over the {MAX_PROJECTION_ROWS} limit; "
+            "use a larger step_months, fewer scenarios or fewer readings",
+            "projection_too_large",
+        )
+
+
+def project_reading(model, scaler, data):
+    """Validate one reading and project it; the whole sweep is one predict_proba call"""
+    values = parse_reading(data)
+    validate_reading(values)
+    months, scenarios, thresholds = parse_projection_options(data)
+    check_projection_size(1, months, scenarios)
+    projected = project_features(model, scaler, np.array([values]), months,
+                                 [rate for _, rate in scenarios], thresholds)
+    response = format_projection(values[_AGE], months, scenarios, thresholds, projected, 0)
+    response["input_values"] = dict(zip(FEATURES, values))
+    return response
+
+
+def project_batch(model, scaler, body):
+    """Project a {"readings": [...]} body with shared projection options
+
+    Invalid readings get an `error` entry, as in predict_batch.
+    """
+    readings = body.get('readings') if isinstance(body, dict) else None
+    if not isinstance(readings, list):
+        raise InvalidReading("Field 'readings' must be a list", "readings_not_a_list")
+    if len(readings) > MAX_BATCH_SIZE:
+        raise InvalidReading(f"Batch size must not exceed {MAX_BATCH_SIZE} readings", "batch_too_large")
+    months, scenarios, thresholds = parse_projection_options(body)
+
+    features, errors = parse_readings(readings)
+    valid = validate_ranges(features, errors)
+    rows = np.flatnonzero(valid)
+    check_projection_size(len(rows), months, scenarios)
+    projected = project_features(model, scaler, features[valid], months,
+                                 [rate for _, rate in scenarios], thresholds)
+    results = [{"index": i, "error": error} for i, error in enumerate(errors)]
+    for j, i in enumerate(rows.tolist()):
+        results[i] = format_projection(features[i, _AGE], months, scenarios, thresholds, projected, j)
+        results[i]["index"] = i
+    failed = len(readings) - len(rows)
+    return {
+        "count": len(readings),
+        "succeeded": len(rows),
+        "failed": failed,
+        "results": results,
+    }
@@ -0,0 +1,251 @@
+"""
+Resident model versions with background loading and atomic activation
+
+ModelRegistry keeps every loaded version in an immutable snapshot
+(active name, {name: ModelVersion}). Writers build a new snapshot under a
+lock and publish it with one attribute assignment; readers take the current
+snapshot without locking, so a request always sees one consistent version
+even while another is being loaded, activated or evicted.
+"""
+import hmac
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .compiled import COMPILED_FILE, load_compiled
+from .inference import InvalidReading
+from .model_store import MODEL_FILE, SCALER_FILE
+
+DEFAULT_MAX_VERSIONS = 2
+LOCAL_VERSION = "local"
+VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+
+class RegistryError(Exception):
+    """Raised when a version cannot be loaded or kept resident"""
+
+
+class ModelVersion:
+    """One loaded (model, scaler) pair and its bookkeeping"""
+
+    def __init__(self, name, model, scaler, info=None):
+        self.name = name
+        self.model = model
+        self.scaler = scaler
+        self.info = info or {}
+        self.memory_bytes = model_memory_bytes(model) + model_memory_bytes(scaler)
+        self.loaded_at = time.time()
+        self.last_used = time.monotonic()
+
+    def stats(self):
+        return {
+            "version": self.name,
+            "memory_bytes": self.memory_bytes,
+            "loaded_at": round(self.loaded_at, 3),
+            **self.info,
+        }
+
+
+def model_memory_bytes(obj):
+    """Approximate bytes held by a fitted forest, scaler or compiled stand-in"""
+    if obj is None:
+        return 0
+    if hasattr(obj, "estimators_"):
+        # scikit-learn trees keep a node record array plus a value array
+        return sum(
+            estimator.tree_.__getstate__()["nodes"].nbytes + estimator.tree_.value.nbytes
+            for estimator in obj.estimators_
+        )
+    return sum(value.nbytes for value in vars(obj).values() if isinstance(value, np.ndarray))
+
+
+class ModelRegistry:
+    """Load, activate and evict model versions produced by `loader(name)`
+
+    `loader` returns (model, scaler) or (model, scaler, info) for a version
+    name. At most `max_versions` versions stay resident, and with
+    `memory_budget` (bytes) their estimated total is kept under it; the
+    active version is never evicted. `on_activate(version)` runs after every
+    activation, e.g. to drop cached outputs of the previous model; activations
+    and their callbacks are serialized, so callbacks run in activation order.
+    """
+
+    def __init__(self, loader, max_versions=DEFAULT_MAX_VERSIONS, memory_budget=None, on_activate=None):
+        self.loader = loader
+        self.max_versions = max_versions
+        self.memory_budget = memory_budget
+        self.on_activate = on_activate
+        self.state = (None, {})
+        self.write_lock = threading.Lock()
+        # Held across a swap and its on_activate call; taken before write_lock
+        self.activation_lock = threading.Lock()
+        self.loading = {}
+        self.errors = {}
+
+    @property
+    def active(self):
+        active, versions = self.state
+        return versions.get(active)
+
+    def get(self, name=None):
+        """Return the named resident version, or the active one; raises InvalidReading if absent"""
+        active, versions = self.state
+        version = versions.get(active if name is None else name)
+        if version is None:
+            if name is None:
+                raise RegistryError("No model version is active")
+            raise InvalidReading(f"Model version {name} is not loaded", "unknown_model_version")
+        version.last_used = time.monotonic()
+        return version
+
+    def load(self, name, activate=True):
+        """Load `name` in the calling thread, publish it and optionally activate it"""
+        loaded = self.loader(name)
+        model, scaler, info = loaded if len(loaded) == 3 else (*loaded, None)
+        version = ModelVersion(name, model, scaler, info)
+        if self.memory_budget is not None and version.memory_bytes > self.memory_budget:
+            raise RegistryError(f"Model version {name} needs {version.memory_bytes} bytes, "
+                                f"over the {self.memory_budget} byte budget")
+        with self.activation_lock:
+            with self.write_lock:
+                active, versions = self.state
+                versions = dict(versions)
+                versions[name] = version
+                if activate or active is None:
+                    active = name
+                self.state = (active, self._evict(active, versions))
+                self.errors.pop(name, None)
+            if active == name and self.on_activate is not None:
+                self.on_activate(version)
+        return version
+
+    def load_async(self, name, activate=True):
+        """Start loading `name` in a background thread; returns False if it is already loading"""
+        with self.write_lock:
+            if name in self.loading:
+                return False
+            thread = threading.Thread(target=self._load_in_background, args=(name, activate),
+                                      name=f"model-loader-{name}", daemon=True)
+            self.loading[name] = thread
+        thread.start()
+        return True
+
+    def _load_in_background(self, name, activate):
+        try:
+            self.load(name, activate)
+        except Exception as e:
+            self.errors[name] = str(e)
+            print(f"Model version {name} failed to load: {e}")
+        finally:
+            with self.write_lock:
+                self.loading.pop(name, None)
+
+    def activate(self, name):
+        """Make an already resident version the default for new requests"""
+        with self.activation_lock:
+            with self.write_lock:
+                active, versions = self.state
+                if name not in versions:
+                    raise InvalidReading(f"Model version {name} is not loaded", "unknown_model_version")
+                self.state = (name, versions)
+            if self.on_activate is not None:
+                self.on_activate(versions[name])
+        return versions[name]
+
+    def _evict(self, active, versions):
+        """Drop least recently used inactive versions until the limits hold"""
+        def over_limits():
+            total = sum(version.memory_bytes for version in versions.values())
+            return len(versions) > self.max_versions or (
+                self.memory_budget is not None and total > self.memory_budget
+            )
+
+        candidates = sorted((v for v in versions.values() if v.name != active), key=lambda v: v.last_used)
+        while candidates and over_limits():
+            del versions[candidates.pop(0).name]
+        return versions
+
+    def stats(self):
+        active, versions = self.state
+        return {
+            "active_version": active,
+            "versions": [version.stats() for version in versions.values()],
+            "loading": sorted(self.loading),
+            "errors": dict(self.errors),
+            "max_versions": self.max_versions,
+            "memory_budget_bytes": self.memory_budget,
+        }
+
+
+def check_version_name(name):
+    """Reject version names that are not plain identifiers, e.g. path traversal"""
+    if not isinstance(name, str) or not VERSION_PATTERN.match(name) or ".." in name:
+        raise InvalidReading("Model version must be a plain name", "invalid_model_version")
+    return name
+
+
+def directory_loader(base):
+    """Loader for versions kept as sub-directories of `base`; LOCAL_VERSION is `base` itself"""
+    base = Path(base)
+
+    def load(name):
+        directory = base if name == LOCAL_VERSION else base / check_version_name(name)
+        if (directory / COMPILED_FILE).exists():
+            return (*load_compiled(directory / COMPILED_FILE), {"artifact": COMPILED_FILE})
+        import joblib
+        return joblib.load(directory / MODEL_FILE), joblib.load(directory / SCALER_FILE), {"artifact": MODEL_FILE}
+
+    return load
+
+
+def requested_version(body, header_value=None):
+    """Version named by the body's "model_version" field or the X-Model-Version header, else None"""
+    name = body.get("model_version") if isinstance(body, dict) else None
+    if name is None:
+        name = header_value or None
+    if name is not None and not isinstance(name, str):
+        raise InvalidReading("Field 'model_version' must be a string", "invalid_model_version")
+    return name
+
+
+def admin_authorized(authorization):
+    """True when the Authorization header carries BATTERY_ADMIN_TOKEN; always False if it is unset"""
+    token = os.environ.get("BATTERY_ADMIN_TOKEN")
+    if not token or not authorization:
+        return False
+    return hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+
+
+def apply_admin_request(registry, body):
+    """Handle {"version", "activate"=true, "reload"=false}; returns (status code, response dict)
+
+    A resident version is activated straight away unless a reload is asked
+    for; anything else is loaded in the background and reported as 202.
+    """
+    name = body.get("version") if isinstance(body, dict) else None
+    if not isinstance(name, str) or not name:
+        raise InvalidReading("Field 'version' must be a non-empty string", "invalid_model_version")
+    check_version_name(name)
+    activate = bool(body.get("activate", True))
+    _, versions = registry.state
+    if name in versions and not body.get("reload"):
+        if activate:
+            registry.activate(name)
+        return 200, registry.stats()
+    started = registry.load_async(name, activate)
+    return 202, {"status": "loading" if started else "already loading", "version": name}
+
+
+def registry_from_env(loader, on_activate=None):
+    """Build a registry sized by BATTERY_MODEL_VERSIONS / BATTERY_MODEL_MEMORY_MB"""
+    budget_mb = os.environ.get("BATTERY_MODEL_MEMORY_MB")
+    return ModelRegistry(
+        loader,
+        int(os.environ.get("BATTERY_MODEL_VERSIONS", DEFAULT_MAX_VERSIONS)),
+        int(float(budget_mb) * 2 ** 20) if budget_mb else None,
+        on_activate,
+    )
@@ -0,0 +1,90 @@
+"""
+Pre-rendered JSON response bodies for the prediction hot path
+
+Only three classes and 2**len(RISK_RULES) risk-factor combinations exist, so
+every static part of a prediction response is built once at import. With
+orjson installed, requests encode a small dict that reuses those shared
+parts; without it, they fill in a %-format template rendered per class and
+risk combination, which beats json.dumps on the full nested dict.
+"""
+import json
+
+from .inference import RECOMMENDATIONS, STATUS_EMOJI, STATUS_NAMES
+from .rules import RISK_COMBINATIONS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(payload):
+    """Encode to a JSON string with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload).decode()
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _fragment(value):
+    # Escape % so the fragment survives being embedded in a %-format template
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("%", "%%")
+
+
+def _template(prediction, risk):
+    return "".join([
+        '{"status":', _fragment(f"{STATUS_NAMES[prediction]} {STATUS_EMOJI[prediction]}"),
+        ',"prediction":', str(prediction),
+        ',"confidence":%r',
+        ',"probabilities":{"healthy":%r,"weak":%r,"failed":%r}',
+        ',"risk_factors":', _fragment(list(RISK_COMBINATIONS[risk])),
+        ',"recommendations":', _fragment(list(RECOMMENDATIONS[prediction])),
+        ',"input_values":{"voltage":%r,"current":%r,"temperature":%r,"age_months":%d,"resistance":%r}}',
+    ])
+
+
+TEMPLATES = {
+    prediction: [_template(prediction, risk) for risk in range(len(RISK_COMBINATIONS))]
+    for prediction in STATUS_NAMES
+}
+OOD_TEMPLATES = {
+    prediction: [template[:-1] + ',"ood_score":%r}' for template in templates]
+    for prediction, templates in TEMPLATES.items()
+}
+STATUS_TEXT = {prediction: f"{STATUS_NAMES[prediction]} {STATUS_EMOJI[prediction]}" for prediction in STATUS_NAMES}
+RISK_LISTS = [list(combination) for combination in RISK_COMBINATIONS]
+RECOMMENDATION_LISTS = {prediction: list(lines) for prediction, lines in RECOMMENDATIONS.items()}
+
+
+def render_prediction(values, prediction, probabilities, risk, ood_score=None):
+    """JSON body equal to dumps(format_prediction(values, prediction, probabilities, risk))
+
+    With an `ood_score` from a DriftMonitor, it is appended as "ood_score".
+    """
+    prediction = int(prediction)
+    healthy, weak, failed = map(float, probabilities[:3])
+    healthy, weak, failed = round(healthy * 100, 1), round(weak * 100, 1), round(failed * 100, 1)
+    confidence = (healthy, weak, failed)[prediction]
+    if orjson is not None:
+        voltage, current, temperature, age_months, resistance = values
+        response = {
+            "status": STATUS_TEXT[prediction],
+            "prediction": prediction,
+            "confidence": confidence,
+            "probabilities": {"healthy": healthy, "weak": weak, "failed": failed},
+            "risk_factors": RISK_LISTS[risk],
+            "recommendations": RECOMMENDATION_LISTS[prediction],
+            "input_values": {
+                "voltage": voltage,
+                "current": current,
+                "temperature": temperature,
+                "age_months": age_months,
+                "resistance": resistance
+            }
+        }
+        if ood_score is not None:
+            response["ood_score"] = ood_score
+        return orjson.dumps(response).decode()
+    # %r of a float is its repr, which is exactly how json encodes finite floats
+    if ood_score is not None:
+        return OOD_TEMPLATES[prediction][risk] % (confidence, healthy, weak, failed, *values, ood_score)
+    return TEMPLATES[prediction][risk] % (confidence, healthy, weak, failed, *values)
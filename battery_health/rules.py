@@ -0,0 +1,101 @@
+"""
+Declarative input-range and risk-factor rules
+
+Each rule table is evaluated two ways from the same definition: a scalar
+walk for single requests, and NumPy boolean masks over a whole feature
+matrix for batches, so batch cost in Python operations does not grow with
+the number of rows.
+"""
+import operator
+
+import numpy as np
+
+# (column, low, high, message) checked in order, first failure wins
+RANGE_RULES = [
+    (0, 10.5, 13.0, "Voltage must be between 10.5V and 13.0V"),
+    (1, 50, 350, "Current must be between 50A and 350A"),
+    (2, -30, 60, "Temperature must be between -30°C and 60°C"),
+    (3, 1, 120, "Age must be between 1 and 120 months"),
+    (4, 0.01, 0.15, "Resistance must be between 0.01Ω and 0.15Ω"),
+]
+
+# (message, conditions): a factor applies when any (column, op, threshold) holds
+RISK_RULES = [
+    ("Low voltage", [(0, "<", 12.0)]),
+    ("High age", [(3, ">", 48)]),
+    ("High resistance", [(4, ">", 0.05)]),
+    ("Extreme temperature", [(2, "<", -10), (2, ">", 40)]),
+]
+
+# (message, trend key, op, threshold) over the per-battery trends from telemetry.py
+TREND_RULES = [
+    ("Falling voltage", "voltage_slope_per_day", "<", -0.05),
+    ("Rising resistance", "resistance_slope_per_day", ">", 0.001),
+]
+
+SCALAR_OPS = {"<": operator.lt, ">": operator.gt}
+ARRAY_OPS = {"<": np.less, ">": np.greater}
+
+VALID = -1
+
+# Risk factor lists for every combination of RISK_RULES, indexed by bitmask
+RISK_COMBINATIONS = [
+    tuple(message for bit, (message, _) in enumerate(RISK_RULES) if code >> bit & 1)
+    for code in range(1 << len(RISK_RULES))
+]
+
+_RANGE_COLUMNS = np.array([rule[0] for rule in RANGE_RULES])
+_RANGE_LOW = np.array([rule[1] for rule in RANGE_RULES], dtype=np.float64)
+_RANGE_HIGH = np.array([rule[2] for rule in RANGE_RULES], dtype=np.float64)
+_RISK_BITS = 1 << np.arange(len(RISK_RULES))
+
+
+def range_rule(values):
+    """Index of the first range rule a single reading breaks, VALID if none"""
+    for index, (column, low, high, _) in enumerate(RANGE_RULES):
+        if not (low <= values[column] <= high):
+            return index
+    return VALID
+
+
+def range_error(values):
+    """Return the message of the first range rule a single reading breaks, or None"""
+    index = range_rule(values)
+    return None if index == VALID else RANGE_RULES[index][3]
+
+
+def range_error_codes(features, ranges=RANGE_RULES):
+    """Index of the first broken rule in `ranges` for every row, VALID if none"""
+    if ranges is RANGE_RULES:
+        columns, low, high = _RANGE_COLUMNS, _RANGE_LOW, _RANGE_HIGH
+    else:
+        columns = np.array([rule[0] for rule in ranges])
+        low = np.array([rule[1] for rule in ranges], dtype=np.float64)
+        high = np.array([rule[2] for rule in ranges], dtype=np.float64)
+    selected = features[:, columns]
+    # NaN compares false both ways, so it counts as out of range like the scalar check
+    broken = ~((selected >= low) & (selected <= high))
+    return np.where(broken.any(axis=1), np.argmax(broken, axis=1), VALID)
+
+
+def risk_code(values):
+    """Bitmask of the risk rules that apply to a single reading"""
+    code = 0
+    for bit, (_, conditions) in enumerate(RISK_RULES):
+        if any(SCALAR_OPS[op](values[column], threshold) for column, op, threshold in conditions):
+            code |= 1 << bit
+    return code
+
+
+def risk_codes(features):
+    """Bitmask of the applicable risk rules for every row of a feature matrix"""
+    masks = np.zeros((len(features), len(RISK_RULES)), dtype=bool)
+    for bit, (_, conditions) in enumerate(RISK_RULES):
+        for column, op, threshold in conditions:
+            masks[:, bit] |= ARRAY_OPS[op](features[:, column], threshold)
+    return masks @ _RISK_BITS
+
+
+def trend_factors(trend):
+    """Messages of the trend rules that a battery's trend summary triggers"""
+    return [message for message, key, op, threshold in TREND_RULES if SCALAR_OPS[op](trend[key], threshold)]
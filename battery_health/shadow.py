@@ -0,0 +1,210 @@
+"""
+Shadow scoring of live traffic with a candidate model version
+
+Handlers hand every row the active model scored to ShadowScorer.submit(),
+which appends it to a queue and returns; the request never waits for the
+candidate. A background thread drains the queue in batches, scores each batch
+with one transform/predict_proba call on the candidate, and accumulates class
+agreement, probability deltas and per-row latency for both models. The queue
+is bounded in rows: when the candidate falls behind, new rows are dropped and
+counted rather than piling up memory or CPU debt.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from .inference import STATUS_NAMES, InvalidReading, predict_with_proba
+from .metrics import Histogram
+
+DEFAULT_MAX_PENDING = 10000
+DEFAULT_BATCH_SIZE = 512
+# How long the worker waits for a batch to fill once rows are pending
+DEFAULT_FLUSH_SECONDS = 0.05
+N_CLASSES = len(STATUS_NAMES)
+
+
+class ShadowScorer:
+    """Score submitted rows with `version`, a registry version name, in the background
+
+    The candidate is looked up in `registry` for every batch, so it can be
+    loaded after shadowing starts; batches that arrive while it is not
+    resident, or while it is the active version, are skipped and counted.
+    """
+
+    def __init__(self, registry, version, max_pending=DEFAULT_MAX_PENDING,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.registry = registry
+        self.version = version
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.items = deque()
+        self.pending = 0
+        self.condition = threading.Condition()
+        self.stats_lock = threading.Lock()
+        self.submitted = self.dropped = self.skipped = self.scored = 0
+        self.batches = self.failed_batches = 0
+        self.last_error = None
+        self.confusion = np.zeros((N_CLASSES, N_CLASSES), dtype=np.int64)
+        self.delta_sum = np.zeros(N_CLASSES)
+        self.abs_delta_sum = np.zeros(N_CLASSES)
+        self.max_abs_delta = 0.0
+        self.primary_latency = Histogram()
+        self.candidate_latency = Histogram()
+        self.thread = threading.Thread(target=self._run, name=f"shadow-{version}", daemon=True)
+        self.thread.start()
+
+    def submit(self, values, prediction, probabilities, seconds):
+        """Queue one scored reading; returns False if it was dropped"""
+        return self._enqueue((values, prediction, probabilities, seconds, 1), 1)
+
+    def submit_batch(self, features, predictions, probabilities, seconds):
+        """Queue n scored rows; `seconds` is the primary model's time for all of them"""
+        rows = len(predictions)
+        if not rows:
+            return True
+        return self._enqueue((features, predictions, probabilities, seconds, rows), rows)
+
+    def _enqueue(self, item, rows):
+        with self.condition:
+            self.submitted += rows
+            if self.pending + rows > self.max_pending:
+                self.dropped += rows
+                return False
+            self.items.append(item)
+            self.pending += rows
+            self.condition.notify()
+        return True
+
+    def _take(self):
+        """Block until rows are pending, give a batch time to fill, then take up to batch_size rows"""
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+            deadline = time.monotonic() + self.flush_seconds
+            while self.pending < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.condition.wait(remaining)
+            taken, rows = [], 0
+            while self.items and (not taken or rows + self.items[0][4] <= self.batch_size):
+                item = self.items.popleft()
+                taken.append(item)
+                rows += item[4]
+            self.pending -= rows
+        return taken, rows
+
+    def _run(self):
+        while True:
+            taken, rows = self._take()
+            try:
+                self._score(taken, rows)
+            except Exception as e:
+                with self.stats_lock:
+                    self.failed_batches += 1
+                    self.last_error = str(e)
+
+    def _score(self, taken, rows):
+        try:
+            candidate = self.registry.get(self.version)
+        except InvalidReading:
+            candidate = None
+        if candidate is None or candidate is self.registry.active:
+            with self.stats_lock:
+                self.skipped += rows
+            return
+        features = np.vstack([np.atleast_2d(item[0]) for item in taken]).astype(np.float64, copy=False)
+        primary = np.concatenate([np.atleast_1d(item[1]) for item in taken]).astype(np.int64)
+        primary_probabilities = np.vstack([np.atleast_2d(item[2]) for item in taken])
+        started = time.perf_counter()
+        predictions, probabilities = predict_with_proba(candidate.model, candidate.scaler.transform(features))
+        candidate_seconds = time.perf_counter() - started
+        delta = probabilities - primary_probabilities
+        confusion = np.bincount(primary * N_CLASSES + predictions.astype(np.int64),
+                                minlength=N_CLASSES * N_CLASSES).reshape(N_CLASSES, N_CLASSES)
+        with self.stats_lock:
+            self.batches += 1
+            self.scored += rows
+            self.confusion += confusion
+            self.delta_sum += delta.sum(axis=0)
+            self.abs_delta_sum += np.abs(delta).sum(axis=0)
+            self.max_abs_delta = max(self.max_abs_delta, float(np.abs(delta).max()))
+            for item in taken:
+                self.primary_latency.observe(item[3] / item[4])
+            self.candidate_latency.observe(candidate_seconds / rows)
+
+    def stats(self):
+        with self.condition:
+            pending = self.pending
+            submitted, dropped = self.submitted, self.dropped
+        with self.stats_lock:
+            scored = self.scored
+            confusion = self.confusion.copy()
+            delta_sum, abs_delta_sum = self.delta_sum.copy(), self.abs_delta_sum.copy()
+            stats = {
+                "candidate_version": self.version,
+                "candidate_loaded": self.version in self.registry.state[1],
+                "submitted_rows": submitted,
+                "dropped_rows": dropped,
+                "skipped_rows": self.skipped,
+                "scored_rows": scored,
+                "pending_rows": pending,
+                "max_pending_rows": self.max_pending,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "last_error": self.last_error,
+                "latency": {
+                    "primary": latency_summary(self.primary_latency),
+                    "candidate": latency_summary(self.candidate_latency),
+                },
+            }
+        if scored:
+            names = [STATUS_NAMES[i].lower() for i in range(N_CLASSES)]
+            per_class = confusion.sum(axis=1)
+            stats["agreement_rate"] = round(float(np.trace(confusion)) / scored, 4)
+            stats["agreement_by_primary_class"] = {
+                names[i]: round(float(confusion[i, i] / per_class[i]), 4) if per_class[i] else None
+                for i in range(N_CLASSES)
+            }
+            stats["confusion"] = {names[i]: dict(zip(names, confusion[i].tolist())) for i in range(N_CLASSES)}
+            stats["probability_delta_mean"] = dict(zip(names, np.round(delta_sum / scored, 4).tolist()))
+            stats["probability_delta_abs_mean"] = dict(zip(names, np.round(abs_delta_sum / scored, 4).tolist()))
+            stats["probability_delta_abs_max"] = round(self.max_abs_delta, 4)
+        return stats
+
+
+def latency_summary(histogram):
+    """Mean and bucket-bound p50/p99 of a per-row latency histogram, in milliseconds"""
+    if not histogram.count:
+        return None
+
+    def bound_ms(q):
+        bound = histogram.quantile(q)
+        # Rows slower than the largest bucket have no finite bound to report
+        return round(bound * 1000, 4) if bound != float("inf") else None
+
+    return {
+        "observations": histogram.count,
+        "mean_ms": round(histogram.sum / histogram.count * 1000, 4),
+        "p50_ms": bound_ms(0.5),
+        "p99_ms": bound_ms(0.99),
+    }
+
+
+def shadow_from_env(registry):
+    """Shadow BATTERY_SHADOW_VERSION, loading it in the background, or return None when unset"""
+    version = os.environ.get("BATTERY_SHADOW_VERSION")
+    if not version:
+        return None
+    if version not in registry.state[1]:
+        registry.load_async(version, activate=False)
+    return ShadowScorer(
+        registry,
+        version,
+        int(os.environ.get("BATTERY_SHADOW_QUEUE_ROWS", DEFAULT_MAX_PENDING)),
+        int(os.environ.get("BATTERY_SHADOW_BATCH_SIZE", DEFAULT_BATCH_SIZE)),
+    )
@@ -0,0 +1,198 @@
+"""
+Per-battery telemetry history with incrementally maintained trend features
+
+TelemetryStore keeps the last `window` readings of every battery in one
+preallocated ring buffer per field, indexed by a slot assigned to the battery
+ID. Alongside the buffers it keeps running sums of t, t**2, y and t*y over
+each window, so the least-squares slope and window mean of every feature are
+updated in O(1) when a reading arrives and one leaves; history is never
+rescanned. Times in the sums are relative to the battery's latest reading,
+and are rebased on every push, so they stay small and the sums keep their
+precision however long a battery has been reporting.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .inference import FEATURES, InvalidReading, format_prediction, score_reading
+from .rules import trend_factors
+
+DEFAULT_WINDOW = 32
+DEFAULT_MAX_BATTERIES = 4096
+# Slopes need a few points before they mean anything
+MIN_TREND_READINGS = 3
+SECONDS_PER_DAY = 86400.0
+
+_VOLTAGE = FEATURES.index("voltage")
+_TEMPERATURE = FEATURES.index("temperature")
+_RESISTANCE = FEATURES.index("resistance")
+
+
+class TelemetryStore:
+    """Fixed-size rolling state for up to `max_batteries` batteries
+
+    When every slot is taken, the battery that reported least recently is
+    dropped to make room for a new one.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_batteries=DEFAULT_MAX_BATTERIES):
+        self.window = window
+        self.max_batteries = max_batteries
+        n_features = len(FEATURES)
+        self.times = np.zeros((max_batteries, window))
+        self.values = np.zeros((max_batteries, window, n_features))
+        self.head = np.zeros(max_batteries, dtype=np.int64)
+        self.count = np.zeros(max_batteries, dtype=np.int64)
+        self.latest = np.zeros(max_batteries)
+        self.sum_t = np.zeros(max_batteries)
+        self.sum_tt = np.zeros(max_batteries)
+        self.sum_y = np.zeros((max_batteries, n_features))
+        self.sum_ty = np.zeros((max_batteries, n_features))
+        self.slots = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _slot(self, battery_id):
+        slot = self.slots.get(battery_id)
+        if slot is not None:
+            self.slots.move_to_end(battery_id)
+            return slot
+        if len(self.slots) < self.max_batteries:
+            slot = len(self.slots)
+        else:
+            _, slot = self.slots.popitem(last=False)
+        self.count[slot] = self.head[slot] = 0
+        self.sum_t[slot] = self.sum_tt[slot] = 0.0
+        self.sum_y[slot] = self.sum_ty[slot] = 0.0
+        self.slots[battery_id] = slot
+        return slot
+
+    def check(self, battery_id, timestamp):
+        """Raise InvalidReading if `timestamp` is older than the battery's last reading"""
+        with self.lock:
+            slot = self.slots.get(battery_id)
+            if slot is not None and self.count[slot] and timestamp < self.latest[slot]:
+                raise InvalidReading("Timestamp is older than the battery's last reading", "stale_timestamp")
+
+    def push(self, battery_id, timestamp, values):
+        """Append one validated reading and return the battery's updated trend"""
+        with self.lock:
+            slot = self._slot(battery_id)
+            n = int(self.count[slot])
+            if n and timestamp < self.latest[slot]:
+                raise InvalidReading("Timestamp is older than the battery's last reading", "stale_timestamp")
+            # Rebase the sums so the new reading sits at t = 0
+            shift = timestamp - self.latest[slot] if n else 0.0
+            self.sum_tt[slot] += n * shift * shift - 2 * shift * self.sum_t[slot]
+            self.sum_ty[slot] -= shift * self.sum_y[slot]
+            self.sum_t[slot] -= n * shift
+            self.latest[slot] = timestamp
+            head = int(self.head[slot])
+            if n == self.window:
+                # The slot being overwritten holds the oldest reading in the window
+                t_old = self.times[slot, head] - timestamp
+                y_old = self.values[slot, head]
+                self.sum_t[slot] -= t_old
+                self.sum_tt[slot] -= t_old * t_old
+                self.sum_y[slot] -= y_old
+                self.sum_ty[slot] -= t_old * y_old
+                n -= 1
+            # A reading at t = 0 only adds to the plain sum of y
+            self.sum_y[slot] += values
+            self.times[slot, head] = timestamp
+            self.values[slot, head] = values
+            self.head[slot] = (head + 1) % self.window
+            self.count[slot] = n + 1
+            return self._trend(slot)
+
+    def _trend(self, slot):
+        n = int(self.count[slot])
+        head = int(self.head[slot])
+        oldest = head if n == self.window else 0
+        latest = self.values[slot, head - 1]
+        mean = self.sum_y[slot] / n
+        denominator = n * self.sum_tt[slot] - self.sum_t[slot] ** 2
+        if n >= 2 and denominator > 0:
+            slope = (n * self.sum_ty[slot] - self.sum_t[slot] * self.sum_y[slot]) / denominator * SECONDS_PER_DAY
+        else:
+            slope = np.zeros(len(FEATURES))
+        return {
+            "readings": n,
+            "span_days": round(float(self.latest[slot] - self.times[slot, oldest]) / SECONDS_PER_DAY, 4),
+            "voltage_mean": round(float(mean[_VOLTAGE]), 4),
+            "voltage_sag": round(float(mean[_VOLTAGE] - latest[_VOLTAGE]), 4),
+            "voltage_slope_per_day": round(float(slope[_VOLTAGE]), 6),
+            "resistance_growth": round(float(latest[_RESISTANCE] - self.values[slot, oldest, _RESISTANCE]), 6),
+            "resistance_slope_per_day": round(float(slope[_RESISTANCE]), 6),
+            "temperature_mean": round(float(mean[_TEMPERATURE]), 2),
+        }
+
+    def trend(self, battery_id):
+        """Current trend of a tracked battery, or None if it is unknown"""
+        with self.lock:
+            slot = self.slots.get(battery_id)
+            return None if slot is None else self._trend(slot)
+
+    def stats(self):
+        arrays = (self.times, self.values, self.head, self.count, self.latest,
+                  self.sum_t, self.sum_tt, self.sum_y, self.sum_ty)
+        return {
+            "batteries": len(self.slots),
+            "max_batteries": self.max_batteries,
+            "window": self.window,
+            "memory_bytes": sum(array.nbytes for array in arrays),
+        }
+
+
+def parse_telemetry(data):
+    """Return (battery_id, timestamp) from a telemetry body; timestamp defaults to now"""
+    battery_id = data.get("battery_id") if isinstance(data, dict) else None
+    if not isinstance(battery_id, (str, int)) or isinstance(battery_id, bool) or battery_id == "":
+        raise InvalidReading("Field 'battery_id' must be a non-empty string or integer", "missing_battery_id")
+    try:
+        timestamp = float(data.get("timestamp", time.time()))
+    except (ValueError, TypeError):
+        raise InvalidReading("Invalid number format in input", "invalid_number")
+    if not np.isfinite(timestamp):
+        raise InvalidReading("Invalid number format in input", "invalid_number")
+    return battery_id, timestamp
+
+
+def ingest_reading(model, scaler, store, data, cache=None, metrics=None, history=None, drift=None, shadow=None):
+    """Score one telemetry reading and fold it into its battery's rolling state
+
+    The model still sees the five current features; the battery's trend is
+    returned next to the prediction and can add trend risk factors. Readings
+    that fail validation or arrive out of order are rejected before scoring,
+    so they never enter the rolling window, metrics or cache. Scored readings
+    are also appended to `history`, a PredictionStore, observed by `drift`, a
+    DriftMonitor, and queued for `shadow`, a ShadowScorer, when given.
+    """
+    battery_id, timestamp = parse_telemetry(data)
+    store.check(battery_id, timestamp)
+    started = time.perf_counter()
+    values, prediction, probabilities, risk = score_reading(model, scaler, data, cache, metrics)
+    if shadow is not None:
+        shadow.submit(values, prediction, probabilities, time.perf_counter() - started)
+    trend = store.push(battery_id, timestamp, values)
+    if history is not None:
+        history.append_one(values, prediction, probabilities, timestamp)
+    response = format_prediction(values, prediction, probabilities, risk)
+    if trend["readings"] >= MIN_TREND_READINGS:
+        response["risk_factors"] += trend_factors(trend)
+    response["battery_id"] = battery_id
+    response["timestamp"] = timestamp
+    response["trend"] = trend
+    if drift is not None:
+        response["ood_score"] = drift.observe(values)
+    return response
+
+
+def telemetry_from_env():
+    """Build the store sized by BATTERY_TELEMETRY_WINDOW / BATTERY_TELEMETRY_BATTERIES"""
+    return TelemetryStore(
+        int(os.environ.get("BATTERY_TELEMETRY_WINDOW", DEFAULT_WINDOW)),
+        int(os.environ.get("BATTERY_TELEMETRY_BATTERIES", DEFAULT_MAX_BATTERIES)),
+    )
@@ -0,0 +1,184 @@
+"""
+Concurrent load generator for a locally running prediction server
+
+Opens --concurrency connections, kept alive where the server allows, and
+sends POST /api/predict requests with varied readings until --requests have
+completed, then reports throughput and latency percentiles. Requests come
+from --clients distinct callers (X-Forwarded-For), as fast as the server
+answers or paced to --rate requests per second in total. A --duplicate-ratio
+share of them send one hot payload, like a fleet checking in at the same
+moment.
+
+With --check it reads the server's coalescing and rate-limit counters from
+/api/health and exits non-zero unless identical requests were coalesced and,
+when the server rate limits, no client got more than its token bucket allows.
+A Flask server only tells the clients apart when it runs with
+BATTERY_TRUSTED_PROXIES=1.
+
+Usage:
+    uvicorn --app-dir api asgi:app --port 8000 &
+    python scripts/benchmark_load.py --port 8000 --concurrency 64 --requests 5000
+    BATTERY_TRUSTED_PROXIES=1 BATTERY_RATE_LIMIT=50 python api/predict.py &
+    python scripts/benchmark_load.py --port 5000 --duplicate-ratio 0.5 --clients 4 --check
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+READING = {"voltage": 12.2, "current": 200, "temperature": 35, "age_months": 42, "resistance": 0.045}
+
+
+def build_request(host, path, payload=None, client=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    method = "POST" if payload is not None else "GET"
+    forwarded = f"X-Forwarded-For: {client}\r\n" if client else ""
+    head = (f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n{forwarded}"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n")
+    return head.encode() + body
+
+
+async def read_response(reader):
+    """Return (status code, body bytes, whether the server keeps the connection open)"""
+    status_line = await reader.readline()
+    length, keep_alive = 0, True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    return int(status_line.split()[1]), await reader.readexactly(length), keep_alive
+
+
+def payloads(count, distinct, duplicate_ratio=0.0, seed=0):
+    """Requests cycling through `distinct` different readings, a `duplicate_ratio` share replaced by READING"""
+    rng = np.random.default_rng(seed)
+    readings = [
+        dict(READING, voltage=round(float(v), 2), age_months=int(a))
+        for v, a in zip(rng.uniform(11.0, 12.9, distinct), rng.integers(1, 120, distinct))
+    ]
+    duplicates = rng.random(count) < duplicate_ratio
+    return [READING if duplicates[i] else readings[i % distinct] for i in range(count)]
+
+
+async def client(host, port, work, results, started, rate):
+    reader = writer = None
+    try:
+        for i, caller, request in work:
+            if rate:
+                # Open-loop pacing: request i is due i / rate seconds into the run
+                await asyncio.sleep(max(0.0, started + i / rate - time.perf_counter()))
+            sent = time.perf_counter()
+            if writer is None:
+                # Servers without keep-alive, like Flask's development server, close after each response
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, _, keep_alive = await read_response(reader)
+            results.append((caller, status, time.perf_counter() - sent))
+            if not keep_alive:
+                writer.close()
+                writer = None
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def fetch_health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(build_request(host, "/api/health"))
+        await writer.drain()
+        _, body, _ = await read_response(reader)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    requests = payloads(args.requests, args.distinct, args.duplicate_ratio)
+    callers = [f"10.0.0.{i % args.clients + 1}" for i in range(args.requests)]
+    # One shared iterator, so connections take the next request in order as they free up
+    work = iter([(i, caller, build_request(args.host, args.path, payload, caller))
+                 for i, (caller, payload) in enumerate(zip(callers, requests))])
+    results = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, work, results, started, args.rate)
+        for _ in range(args.concurrency)
+    ))
+    seconds = time.perf_counter() - started
+    health = await fetch_health(args.host, args.port) if args.check else {}
+    return seconds, results, health
+
+
+def check(args, results, seconds, health):
+    """Problems found in the run, as messages; empty when everything held"""
+    problems = []
+    coalescing = health.get("coalescing")
+    if args.duplicate_ratio > 0 and args.concurrency > 1:
+        if not coalescing or not coalescing["coalesced"]:
+            problems.append("no identical requests were coalesced")
+    limit = health.get("rate_limit")
+    if limit:
+        allowed = limit["burst"] + limit["rate_per_second"] * seconds
+        admitted = Counter(caller for caller, status, _ in results if status != 429)
+        for caller, count in sorted(admitted.items()):
+            if count > allowed + 1:
+                problems.append(f"{caller} was admitted {count} times, token bucket allows {allowed:.0f}")
+        if not any(status == 429 for _, status, _ in results) and len(results) / args.clients > allowed:
+            problems.append("no request was rate limited")
+    if any(status not in (200, 429) for _, status, _ in results):
+        problems.append("some requests failed")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8000, type=int)
+    parser.add_argument("--path", default="/api/predict")
+    parser.add_argument("--concurrency", default=32, type=int)
+    parser.add_argument("--requests", default=2000, type=int)
+    parser.add_argument("--distinct", default=500, type=int, help="number of different readings sent")
+    parser.add_argument("--duplicate-ratio", default=0.0, type=float,
+                        help="share of requests that send the same hot payload")
+    parser.add_argument("--clients", default=1, type=int, help="distinct X-Forwarded-For callers")
+    parser.add_argument("--rate", type=float, help="total requests per second (default: as fast as answered)")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if coalescing or limits misbehave")
+    args = parser.parse_args()
+    if not 0 <= args.duplicate_ratio <= 1:
+        parser.error("--duplicate-ratio must be between 0 and 1")
+    if args.clients < 1 or (args.rate is not None and args.rate <= 0):
+        parser.error("--clients and --rate must be positive")
+
+    seconds, results, health = asyncio.run(run(args))
+    statuses = Counter(status for _, status, _ in results)
+    latencies = np.array([elapsed for _, _, elapsed in results])
+    print(f"{len(latencies)} requests in {seconds:.2f}s: {len(latencies) / seconds:,.0f} req/s "
+          f"at concurrency {args.concurrency} from {args.clients} clients")
+    print(f"latency p50 {np.percentile(latencies, 50) * 1000:.1f} ms, "
+          f"p99 {np.percentile(latencies, 99) * 1000:.1f} ms, max {latencies.max() * 1000:.1f} ms")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+
+    if args.check:
+        print(f"coalescing: {json.dumps(health.get('coalescing'))}")
+        print(f"rate limit: {json.dumps(health.get('rate_limit'))}")
+        problems = check(args, results, seconds, health)
+        for problem in problems:
+            print(f"FAILED: {problem}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
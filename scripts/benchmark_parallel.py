@@ -0,0 +1,58 @@
+"""
+Measure how parallel forest scoring scales from 1 to N worker processes
+
+Usage:
+    python scripts/benchmark_parallel.py --rows 500000 --max-workers 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from model_args import add_model_arguments, load_model
+from battery_health.parallel import ParallelForest
+from check_parity import sample_features
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", default=200000, type=int)
+    parser.add_argument("--max-workers", default=os.cpu_count() or 1, type=int)
+    add_model_arguments(parser)
+    args = parser.parse_args()
+
+    model, scaler = load_model(args)
+    features_scaled = scaler.transform(sample_features(args.rows))
+
+    expected = None
+    baseline = None
+    print(f"{'workers':>7} {'seconds':>8} {'rows/sec':>10} {'speedup':>8}")
+    for workers in worker_counts(args.max_workers):
+        with ParallelForest(model, workers=workers) as forest:
+            # Warm the pool so process start-up is not part of the measurement
+            forest.predict_proba(features_scaled[:forest.shard_rows * workers])
+            started = time.perf_counter()
+            proba = forest.predict_proba(features_scaled)
+            seconds = time.perf_counter() - started
+        if expected is None:
+            expected, baseline = proba, seconds
+        elif not np.array_equal(proba, expected):
+            print(f"Results with {workers} workers differ from the single-worker run")
+            return 1
+        print(f"{workers:>7} {seconds:>8.2f} {args.rows / seconds:>10,.0f} {baseline / seconds:>7.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
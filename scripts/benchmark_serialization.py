@@ -0,0 +1,75 @@
+"""
+Compare per-request response serialization before and after pre-rendering
+
+"before" builds the nested response dict and runs json.dumps on it, as the
+handler used to; "after" fills a pre-rendered template. Every rendered body
+is also checked to decode to the same document as the dict it replaces.
+
+Usage:
+    python scripts/benchmark_serialization.py
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health import render
+from battery_health.inference import format_prediction
+from battery_health.rules import risk_code
+from build_lookup_table import sample_in_range
+
+
+def per_call(fn, cases, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for case in cases:
+            fn(*case)
+    return (time.perf_counter() - started) / (repeat * len(cases))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", default=1000, type=int)
+    parser.add_argument("--repeat", default=20, type=int)
+    args = parser.parse_args()
+
+    # Serialization does not depend on the model, so random outputs stand in for it
+    rng = np.random.default_rng(0)
+    features = sample_in_range(args.cases)
+    cases = []
+    for row in features:
+        values = (*row[:3].tolist(), int(row[3]), float(row[4]))
+        probabilities = rng.dirichlet(np.ones(3))
+        cases.append((values, int(np.argmax(probabilities)), probabilities, risk_code(values)))
+
+    for case in cases:
+        if json.loads(render.render_prediction(*case)) != format_prediction(*case):
+            print("Rendered body differs from json.dumps(format_prediction(...))")
+            return 1
+
+    encoder = render.orjson
+    timings = [("before: dict + json.dumps",
+                per_call(lambda *c: json.dumps(format_prediction(*c)), cases, args.repeat))]
+    if encoder is not None:
+        timings.append(("after: shared parts + orjson", per_call(render.render_prediction, cases, args.repeat)))
+    # The template path is what runs when orjson is not installed
+    render.orjson = None
+    timings.append(("after: %-format template", per_call(render.render_prediction, cases, args.repeat)))
+    for case in cases:
+        if json.loads(render.render_prediction(*case)) != format_prediction(*case):
+            print("Template body differs from json.dumps(format_prediction(...))")
+            return 1
+    render.orjson = encoder
+    baseline = timings[0][1]
+    print(f"fast encoder: {'orjson' if encoder is not None else 'not installed'}")
+    for name, seconds in timings:
+        print(f"{name:<30} {seconds * 1e6:7.2f} us/request  {baseline / seconds:5.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
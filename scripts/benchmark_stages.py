@@ -0,0 +1,67 @@
+"""
+Micro-benchmark of each stage of the shared prediction core
+
+Usage:
+    python scripts/benchmark_stages.py --model models/battery_model.pkl \
+        --scaler models/battery_scaler.pkl
+    python scripts/benchmark_stages.py --compiled models/battery_forest.npz
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from model_args import add_model_arguments, load_model
+from battery_health.inference import (
+    format_prediction,
+    parse_reading,
+    predict_with_proba,
+    validate_reading,
+)
+
+SAMPLE = {"voltage": 12.2, "current": 200, "temperature": 35, "age_months": 42, "resistance": 0.045}
+
+
+def time_stage(fn, repeat):
+    """Median seconds per call over `repeat` calls"""
+    timings = np.empty(repeat)
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings[i] = time.perf_counter() - started
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_model_arguments(parser)
+    parser.add_argument("--repeat", default=500, type=int)
+    args = parser.parse_args()
+
+    model, scaler = load_model(args)
+    values = parse_reading(SAMPLE)
+    features = np.array([values], dtype=np.float64)
+    features_scaled = scaler.transform(features)
+    predictions, probabilities = predict_with_proba(model, features_scaled)
+    response = format_prediction(values, predictions[0], probabilities[0])
+
+    stages = [
+        ("parse", lambda: parse_reading(SAMPLE)),
+        ("validate", lambda: validate_reading(values)),
+        ("to_array", lambda: np.array([values], dtype=np.float64)),
+        ("scale", lambda: scaler.transform(features)),
+        ("predict", lambda: predict_with_proba(model, features_scaled)),
+        ("format", lambda: format_prediction(values, predictions[0], probabilities[0])),
+        ("serialize", lambda: json.dumps(response)),
+    ]
+    results = [(name, time_stage(fn, args.repeat)) for name, fn in stages]
+    total = sum(seconds for _, seconds in results)
+    print(f"{'stage':<10} {'median us':>10} {'share':>7}")
+    for name, seconds in results:
+        print(f"{name:<10} {seconds * 1e6:>10.1f} {seconds / total:>7.1%}")
+    print(f"{'total':<10} {total * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
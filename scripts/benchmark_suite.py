@@ -0,0 +1,281 @@
+"""
+Benchmark every entry point against a locally generated stand-in model
+
+Each target runs in a fresh interpreter so cold start and peak RSS are
+measured in isolation:
+
+    index           api/index.py handler with the pickled model
+    index-compiled  api/index.py handler with the exported NumPy forest
+    index-lookup    api/index.py handler serving from a lookup table
+    flask           api/predict.py through the Flask test client
+    app             app.py predict() called directly (needs gradio)
+
+The stand-in model is trained on synthetic readings and served through an
+offline ModelStore cache, so no Hugging Face access is needed. Results are
+written as JSON; pass an earlier file to --compare to see the change.
+
+Usage:
+    python scripts/benchmark_suite.py --output bench.json
+    python scripts/benchmark_suite.py --targets index,flask --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+TARGETS = ["index", "index-compiled", "index-lookup", "flask", "app"]
+# Coarse grid so the benchmark table builds in seconds
+LOOKUP_STEPS = {"voltage": 0.1, "current": 100.0, "temperature": 30.0, "age_months": 4, "resistance": 0.02}
+COLD_START_BODY = json.dumps({"voltage": 12.2, "current": 200, "temperature": 35, "age_months": 42, "resistance": 0.045})
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def measure(call, workload, min_seconds):
+    """Single-request latency percentiles and batch throughput for one entry point"""
+    bodies = workload["single"]
+    for body in bodies[:20]:
+        call(body)
+    timings = []
+    for body in bodies:
+        started = time.perf_counter()
+        status = call(body)
+        timings.append(time.perf_counter() - started)
+        if status != 200:
+            raise RuntimeError(f"request failed with status {status}")
+    timings.sort()
+    results = {"single": {
+        "requests": len(timings),
+        "p50_ms": percentile(timings, 0.50) * 1000,
+        "p99_ms": percentile(timings, 0.99) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+    }}
+    batch_call = workload.get("batch_call")
+    if batch_call is None:
+        return results
+    results["batch"] = {}
+    for size, body in workload["batch"].items():
+        batch_call(body)
+        requests, started = 0, time.perf_counter()
+        while True:
+            batch_call(body)
+            requests += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+        results["batch"][size] = {
+            "requests": requests,
+            "rows_per_second": int(size) * requests / elapsed,
+            "ms_per_request": elapsed / requests * 1000,
+        }
+    return results
+
+
+def run_worker(target, workload_path, min_seconds):
+    """Import one entry point, time its first answer, then benchmark it; prints JSON"""
+    workload = json.loads(Path(workload_path).read_text())
+    started = time.perf_counter()
+    if target.startswith("index"):
+        sys.path.insert(0, str(ROOT / "api"))
+        import index
+        imported = time.perf_counter()
+
+        def call(body, path='/api/predict'):
+            return index.handler({'httpMethod': 'POST', 'path': path, 'body': body}, None)['statusCode']
+
+        workload["batch_call"] = lambda body: call(body, '/api/predict/batch')
+    elif target == "flask":
+        sys.path.insert(0, str(ROOT / "api"))
+        import predict
+        imported = time.perf_counter()
+        client = predict.app.test_client()
+
+        def call(body, path='/api/predict'):
+            return client.post(path, data=body, content_type='application/json').status_code
+
+        workload["batch_call"] = lambda body: call(body, '/api/predict/batch')
+    else:
+        sys.path.insert(0, str(ROOT))
+        import app
+        imported = time.perf_counter()
+
+        def call(body):
+            reading = json.loads(body)
+            result = app.predict(reading["voltage"], reading["current"], reading["temperature"],
+                                 reading["age_months"], reading["resistance"])
+            return 500 if result.startswith("Error") else 200
+
+    status = call(COLD_START_BODY)
+    cold_start = time.perf_counter() - started
+    if status != 200:
+        raise RuntimeError(f"first request failed with status {status}")
+    results = {"import_seconds": imported - started, "cold_start_seconds": cold_start}
+    results.update(measure(call, workload, min_seconds))
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(results))
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process since it was exec'd"""
+    # Linux keeps ru_maxrss across exec, so it would report the parent's peak
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+def prepare(directory, requests, batch_sizes, trees):
+    """Write the stand-in caches, lookup table and request bodies; returns per-target env"""
+    sys.path.insert(0, str(Path(__file__).parent))
+    from make_standin_model import sample_readings, train_standin, write_standin
+    from battery_health.inference import FEATURES
+    from battery_health.lookup import build_lookup_table
+
+    model, scaler = train_standin(trees=trees)
+    pickles = write_standin(directory / "pickle", model, scaler)
+    write_standin(directory / "compiled", model, scaler, compiled=True)
+    lookup_path = directory / "battery_lookup.npy"
+    build_lookup_table(model, scaler, lookup_path, LOOKUP_STEPS)
+
+    def body(row):
+        reading = dict(zip(FEATURES, row.tolist()))
+        reading["age_months"] = int(reading["age_months"])
+        return reading
+
+    rows = sample_readings(max(requests, max(batch_sizes)), seed=1)
+    workload = {
+        "single": [json.dumps(body(row)) for row in rows[:requests]],
+        "batch": {size: json.dumps({"readings": [body(row) for row in rows[:size]]}) for size in batch_sizes},
+    }
+    (directory / "workload.json").write_text(json.dumps(workload))
+
+    base = dict(os.environ, HF_HUB_OFFLINE="1", BATTERY_MODEL_REVISION="main")
+    for name in ("BATTERY_LOOKUP_TABLE", "BATTERY_CACHE_SIZE", "BATTERY_PREDICTION_STORE"):
+        base.pop(name, None)
+    return {
+        "index": dict(base, BATTERY_MODEL_CACHE=str(directory / "pickle")),
+        "index-compiled": dict(base, BATTERY_MODEL_CACHE=str(directory / "compiled")),
+        "index-lookup": dict(base, BATTERY_MODEL_CACHE=str(directory / "compiled"),
+                             BATTERY_LOOKUP_TABLE=str(lookup_path)),
+        "flask": dict(base, BATTERY_MODEL_DIR=str(pickles)),
+        "app": dict(base, BATTERY_MODEL_CACHE=str(directory / "pickle")),
+    }
+
+
+def environment():
+    import numpy
+    import sklearn
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def report(results, baseline, max_p99_ms):
+    """Print one line per target, with the ratio to the baseline run when given"""
+    def change(target, *keys):
+        try:
+            old = baseline["results"][target]
+            for key in keys:
+                old = old[key]
+        except (KeyError, TypeError):
+            return ""
+        new = results[target]
+        for key in keys:
+            new = new[key]
+        return f" ({new / old:.2f}x)" if old else ""
+
+    failed = []
+    for target, result in results.items():
+        if "error" in result:
+            print(f"{target:<15} skipped: {result['error']}")
+            continue
+        single = result["single"]
+        print(f"{target:<15} cold {result['cold_start_seconds'] * 1000:8.1f} ms{change(target, 'cold_start_seconds')}"
+              f"  p50 {single['p50_ms']:7.3f} ms{change(target, 'single', 'p50_ms')}"
+              f"  p99 {single['p99_ms']:7.3f} ms{change(target, 'single', 'p99_ms')}"
+              f"  rss {result['peak_rss_mb']:6.1f} MB{change(target, 'peak_rss_mb')}")
+        for size, batch in result.get("batch", {}).items():
+            print(f"{'':<15} batch {size:>6}: {batch['rows_per_second']:12,.0f} rows/s"
+                  f"{change(target, 'batch', size, 'rows_per_second')}")
+        if single["p99_ms"] > max_p99_ms:
+            failed.append(target)
+    if failed:
+        print(f"p99 above {max_p99_ms} ms: {', '.join(failed)}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma-separated subset of " + ", ".join(TARGETS))
+    parser.add_argument("--requests", default=1000, type=int, help="single requests per target")
+    parser.add_argument("--batch-sizes", default="1,10,100,1000")
+    parser.add_argument("--min-seconds", default=1.0, type=float, help="time spent on each batch size")
+    parser.add_argument("--trees", default=100, type=int, help="trees in the stand-in forest")
+    parser.add_argument("--output", default="benchmark_results.json", type=Path)
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--max-p99-ms", default=100.0, type=float,
+                        help="exit non-zero when any target's single-request p99 is above this")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--workload", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.workload, args.min_seconds)
+        return 0
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = sorted(set(targets) - set(TARGETS))
+    if unknown:
+        parser.error(f"unknown target: {unknown[0]}")
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="battery_bench_") as tmp:
+        envs = prepare(Path(tmp), args.requests, batch_sizes, args.trees)
+        for target in targets:
+            print(f"running {target} ...", file=sys.stderr)
+            completed = subprocess.run(
+                [sys.executable, __file__, "--worker", target, "--workload", str(Path(tmp) / "workload.json"),
+                 "--min-seconds", str(args.min_seconds)],
+                cwd=ROOT, env=envs[target], capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                lines = completed.stderr.strip().splitlines()
+                results[target] = {"error": lines[-1] if lines else f"exit code {completed.returncode}"}
+            else:
+                results[target] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    run = {"environment": environment(), "settings": {
+        "requests": args.requests, "batch_sizes": batch_sizes,
+        "min_seconds": args.min_seconds, "trees": args.trees,
+    }, "results": results}
+    args.output.write_text(json.dumps(run, indent=2))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    failed = report(results, baseline, args.max_p99_ms)
+    print(f"results saved to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Build the drift monitor's reference statistics from the training data
+
+Reads a CSV with voltage, current, temperature, age_months and resistance
+columns (other columns are ignored) and writes the per-feature mean,
+standard deviation and histogram that DriftMonitor compares traffic with.
+Without this file the monitor falls back to the scaler's mean and standard
+deviation and does not flag drift on histogram shape.
+
+Usage:
+    python scripts/build_drift_reference.py battery_training_data.csv
+    BATTERY_DRIFT_REFERENCE=models/battery_drift_reference.json python api/predict.py
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from model_args import MODELS_DIR
+from battery_health.drift import BIN_EDGES, REFERENCE_FILE, build_reference, save_reference
+from battery_health.inference import DEFAULT_RESISTANCE, FEATURES
+
+
+def read_features(path):
+    """n x 5 feature matrix from a CSV; rows with missing or malformed values are skipped"""
+    rows, skipped = [], 0
+    with open(path, newline="", encoding="utf-8") as f:
+        for record in csv.DictReader(f):
+            if not record.get("resistance"):
+                record["resistance"] = DEFAULT_RESISTANCE
+            try:
+                rows.append([float(record[feature]) for feature in FEATURES])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+    return np.array(rows, dtype=np.float64).reshape(-1, len(FEATURES)), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("data", type=Path, help="training data CSV")
+    parser.add_argument("--output", default=MODELS_DIR / REFERENCE_FILE, type=Path)
+    args = parser.parse_args()
+
+    features, skipped = read_features(args.data)
+    if not len(features):
+        print(f"No usable rows in {args.data}")
+        return 1
+    reference = build_reference(features)
+    save_reference(reference, args.output)
+
+    print(f"Wrote {args.output} from {len(features)} rows ({skipped} skipped)")
+    print(f"{'feature':<12} {'mean':>10} {'std':>10} {'in tails':>9}")
+    for j, feature in enumerate(FEATURES):
+        tails = reference["proportions"][j, 0] + reference["proportions"][j, -1]
+        print(f"{feature:<12} {reference['mean'][j]:>10.4f} {reference['std'][j]:>10.4f} {tails:>9.2%}")
+    print(f"Histogram: {len(BIN_EDGES) + 1} bins over z in [{BIN_EDGES[0]}, {BIN_EDGES[-1]}]")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Build a precomputed probability lookup table and report its error
+
+Usage:
+    python scripts/build_lookup_table.py --output models/battery_lookup.npy
+    python scripts/build_lookup_table.py --output models/battery_lookup.npy \
+        --steps voltage=0.02,current=25 --report-only
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from model_args import MODELS_DIR, add_model_arguments, load_model
+from battery_health.inference import predict_with_proba
+from battery_health.lookup import build_lookup_table, grid_layout, load_lookup, parse_grid_steps
+from battery_health.rules import RANGE_RULES
+
+
+def sample_in_range(samples, seed=1):
+    """Random readings inside the validated API ranges, whole-month ages"""
+    rng = np.random.default_rng(seed)
+    low = np.array([rule[1] for rule in RANGE_RULES], dtype=np.float64)
+    high = np.array([rule[2] for rule in RANGE_RULES], dtype=np.float64)
+    features = rng.uniform(low, high, size=(samples, len(low)))
+    features[:, 3] = np.round(features[:, 3])
+    return features
+
+
+def report(model, scaler, path, samples):
+    """Compare the table with exact inference on random in-range readings"""
+    features = sample_in_range(samples)
+    exact_classes, exact_proba = predict_with_proba(model, scaler.transform(features))
+    table_model, table_scaler = load_lookup(path)
+    table_classes, table_proba = predict_with_proba(table_model, table_scaler.transform(features))
+    delta = np.abs(table_proba - exact_proba)
+    print(f"Class agreement:        {np.mean(table_classes == exact_classes):.4%} of {samples} readings")
+    print(f"Probability error mean: {delta.mean():.4f}")
+    print(f"Probability error p99:  {np.quantile(delta.max(axis=1), 0.99):.4f}")
+    print(f"Probability error max:  {delta.max():.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", default=MODELS_DIR / "battery_lookup.npy", type=Path)
+    parser.add_argument("--steps", default="", help="grid spacing overrides, e.g. voltage=0.02,current=25")
+    parser.add_argument("--report-only", action="store_true", help="skip building, only compare")
+    parser.add_argument("--samples", default=100000, type=int)
+    add_model_arguments(parser)
+    args = parser.parse_args()
+
+    model, scaler = load_model(args)
+    if not args.report_only:
+        steps = parse_grid_steps(args.steps)
+        _, _, counts = grid_layout(steps)
+        print(f"Evaluating {int(np.prod(counts)):,} grid points ({' x '.join(map(str, counts))})")
+        started = time.perf_counter()
+        build_lookup_table(model, scaler, args.output, steps)
+        print(f"Wrote {args.output} ({args.output.stat().st_size / 2**20:.1f} MiB) "
+              f"in {time.perf_counter() - started:.1f}s")
+    report(model, scaler, args.output, args.samples)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Check that the fused single-pass inference matches the two-call results
+
+Usage:
+    python scripts/check_parity.py --model models/battery_model.pkl \
+        --scaler models/battery_scaler.pkl
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health.inference import predict_with_proba
+from battery_health.rules import (
+    RANGE_RULES,
+    VALID,
+    range_error,
+    range_error_codes,
+    risk_code,
+    risk_codes,
+)
+
+# Sampling box wider than the API ranges so out-of-range rows are covered too
+LOW = np.array([10.0, 0.0, -40.0, 0.0, 0.0])
+HIGH = np.array([13.5, 400.0, 70.0, 130.0, 0.2])
+
+
+def sample_features(samples, seed=0):
+    """Draw random readings, with whole-number ages like the API produces"""
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(LOW, HIGH, size=(samples, len(LOW)))
+    features[:, 3] = np.round(features[:, 3])
+    return features
+
+
+def edge_features():
+    """Rows sitting exactly on, and just either side of, every rule threshold"""
+    base = np.array([12.6, 150.0, 25.0, 24.0, 0.03])
+    edges = [(c, v) for c, low, high, _ in RANGE_RULES for v in (low, high)]
+    edges += [(0, 12.0), (3, 48), (4, 0.05), (2, -10), (2, 40), (2, np.nan)]
+    rows = []
+    for column, value in edges:
+        for delta in (-1e-9, 0.0, 1e-9):
+            row = base.copy()
+            row[column] = value + delta
+            rows.append(row)
+    return np.array(rows)
+
+
+def check_rules(features):
+    """Compare the vectorized rule evaluation with the per-reading one"""
+    codes = range_error_codes(features)
+    for row, code in zip(features, codes):
+        expected = range_error(row)
+        actual = None if code == VALID else RANGE_RULES[code][3]
+        if actual != expected:
+            return False
+    return list(risk_codes(features)) == [risk_code(row) for row in features]
+
+
+def check_fused(model, features_scaled):
+    """Compare predict_with_proba with separate predict/predict_proba calls"""
+    predictions, probabilities = predict_with_proba(model, features_scaled)
+    same_classes = np.array_equal(predictions, model.predict(features_scaled))
+    same_proba = np.array_equal(probabilities, model.predict_proba(features_scaled))
+    return same_classes and same_proba
+
+
+def main():
+    models_dir = Path(__file__).parent.parent / "models"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=models_dir / "battery_model.pkl", type=Path)
+    parser.add_argument("--scaler", default=models_dir / "battery_scaler.pkl", type=Path)
+    parser.add_argument("--samples", default=10000, type=int)
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    features_scaled = scaler.transform(sample_features(args.samples))
+
+    failures = 0
+    features = np.vstack([sample_features(args.samples), edge_features()])
+    checks = [
+        ("vectorized rules", lambda: check_rules(features)),
+        ("fused predict (batch)", lambda: check_fused(model, features_scaled)),
+        # Single-row calls are what the request handlers make
+        ("fused predict (single row)", lambda: all(
+            check_fused(model, features_scaled[i:i + 1]) for i in range(min(200, args.samples))
+        )),
+    ]
+    for name, check in checks:
+        passed = check()
+        failures += not passed
+        print(f"{'PASS' if passed else 'FAIL'}  {name}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
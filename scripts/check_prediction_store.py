@@ -0,0 +1,91 @@
+"""
+Check the prediction store's edge cases against a small stand-in model
+
+Covers appends with no rows, batches in which every reading is invalid,
+round-tripping appended rows through query(), the background flusher sealing
+a quiet buffer and close() sealing the tail at shutdown.
+
+Usage:
+    python scripts/check_prediction_store.py
+"""
+import argparse
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from make_standin_model import sample_readings, train_standin
+from battery_health.batch import predict_batch
+from battery_health.inference import FEATURES, predict_with_proba
+from battery_health.prediction_store import PredictionStore
+
+
+def check_empty_append(store):
+    """Appending zero rows is a no-op"""
+    store.append(np.zeros((0, len(FEATURES))), np.zeros(0, dtype=int), np.zeros((0, 3)))
+    return store.stats()["rows"] == 0
+
+
+def check_invalid_batches(model, scaler, store):
+    """Empty and all-invalid batches score without touching the store"""
+    empty = predict_batch(model, scaler, {"readings": []}, store=store)
+    invalid = predict_batch(model, scaler, {"readings": [{"voltage": 99}, "x"]}, store=store)
+    return empty["count"] == 0 and invalid["failed"] == 2 and store.stats()["rows"] == 0
+
+
+def check_round_trip(model, scaler, store):
+    """Rows appended in bulk come back from query() after a flush"""
+    features = sample_readings(100)
+    predictions, probabilities = predict_with_proba(model, scaler.transform(features))
+    store.append(features, predictions, probabilities)
+    store.flush()
+    result = store.query(limit=1000)
+    return result["count"] == 100 and store.stats()["buffered"] == 0
+
+
+def check_background_flush(directory):
+    """A partly filled buffer is sealed by the flusher without another append"""
+    store = PredictionStore(directory, chunk_rows=64, flush_seconds=0.1)
+    store.start_flusher()
+    store.append_one((12.5, 150.0, 25.0, 24, 0.03), 0, (0.9, 0.1, 0.0))
+    deadline = time.monotonic() + 2.0
+    while store.stats()["buffered"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    store.close()
+    return store.stats()["buffered"] == 0 and len(store.chunks) == 1
+
+
+def check_close(directory):
+    """close() seals buffered rows, and a reopened store finds them"""
+    store = PredictionStore(directory, chunk_rows=64, flush_seconds=3600)
+    store.append_one((12.5, 150.0, 25.0, 24, 0.03), 0, (0.9, 0.1, 0.0))
+    store.close()
+    return PredictionStore(directory).query()["count"] == 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trees", default=10, type=int, help="trees in the stand-in forest")
+    args = parser.parse_args()
+
+    model, scaler = train_standin(trees=args.trees)
+    failures = 0
+    with tempfile.TemporaryDirectory(prefix="battery_store_") as directory:
+        store = PredictionStore(directory, chunk_rows=64)
+        checks = [
+            ("empty append", lambda: check_empty_append(store)),
+            ("empty and all-invalid batches", lambda: check_invalid_batches(model, scaler, store)),
+            ("append, flush and query", lambda: check_round_trip(model, scaler, store)),
+            ("background flush", lambda: check_background_flush(f"{directory}/flusher")),
+            ("close seals the buffer", lambda: check_close(f"{directory}/close")),
+        ]
+        for name, check in checks:
+            passed = check()
+            failures += not passed
+            print(f"{'PASS' if passed else 'FAIL'}  {name}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Export the trained scaler and Random Forest to a NumPy-only archive
+
+Usage:
+    python scripts/export_model.py --model models/battery_model.pkl \
+        --scaler models/battery_scaler.pkl --output models/battery_forest.npz
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from battery_health.compiled import COMPILED_FILE, export_compiled, load_compiled
+from check_parity import sample_features
+
+
+def verify(model, scaler, output, samples):
+    """Check that the compiled archive reproduces sklearn bit for bit"""
+    features = sample_features(samples)
+    compiled_model, compiled_scaler = load_compiled(output)
+    scaled = scaler.transform(features)
+    compiled_scaled = compiled_scaler.transform(features)
+    if not np.array_equal(scaled, compiled_scaled):
+        return False
+    if not np.array_equal(model.predict_proba(scaled), compiled_model.predict_proba(compiled_scaled)):
+        return False
+    return np.array_equal(model.predict(scaled), compiled_model.predict(compiled_scaled))
+
+
+def main():
+    models_dir = Path(__file__).parent.parent / "models"
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default=models_dir / "battery_model.pkl", type=Path)
+    parser.add_argument("--scaler", default=models_dir / "battery_scaler.pkl", type=Path)
+    parser.add_argument("--output", default=models_dir / COMPILED_FILE, type=Path)
+    parser.add_argument("--verify-samples", default=10000, type=int,
+                        help="random rows used for the parity check (0 to skip)")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    scaler = joblib.load(args.scaler)
+    export_compiled(model, scaler, args.output)
+    print(f"Wrote {args.output} ({args.output.stat().st_size / 1024:.1f} KiB, "
+          f"{len(model.estimators_)} trees)")
+
+    if args.verify_samples:
+        if not verify(model, scaler, args.output, args.verify_samples):
+            print("Parity check FAILED: compiled output differs from scikit-learn")
+            return 1
+        print(f"Parity check passed on {args.verify_samples} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
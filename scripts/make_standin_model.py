@@ -0,0 +1,91 @@
+"""
+Train a stand-in model on synthetic readings for offline benchmarks
+
+The stand-in has the same shape as the published model (a scikit-learn
+RandomForestClassifier over the five scaled features, classes 0/1/2) but is
+trained on generated data, so it is only good for measuring speed. The
+artifacts are written into a ModelStore cache directory with a manifest, so
+the entry points load them through their normal path with HF_HUB_OFFLINE=1.
+
+Usage:
+    python scripts/make_standin_model.py --cache /tmp/battery_standin
+    HF_HUB_OFFLINE=1 BATTERY_MODEL_CACHE=/tmp/battery_standin python scripts/profile_startup.py
+"""
+import argparse
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from model_args import MODELS_DIR
+from battery_health.compiled import COMPILED_FILE, export_compiled
+from battery_health.model_store import MODEL_FILE, REPO_ID, SCALER_FILE, ModelStore, file_sha256
+from battery_health.rules import RANGE_RULES
+
+STANDIN_SHA = "standin"
+
+
+def sample_readings(samples, seed=0):
+    """Uniform readings inside every RANGE_RULES range, with whole-number ages"""
+    rng = np.random.default_rng(seed)
+    rules = sorted(RANGE_RULES)
+    low = np.array([rule[1] for rule in rules], dtype=np.float64)
+    high = np.array([rule[2] for rule in rules], dtype=np.float64)
+    features = rng.uniform(low, high, size=(samples, len(rules)))
+    features[:, 3] = np.round(features[:, 3])
+    return features
+
+
+def train_standin(samples=5000, trees=100, seed=0):
+    """Return (model, scaler) fitted to a noisy rule of thumb over the inputs"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    features = sample_readings(samples, seed)
+    rng = np.random.default_rng(seed + 1)
+    wear = (12.6 - features[:, 0]) * 2 + features[:, 3] / 40 + features[:, 4] * 20
+    labels = np.digitize(wear + rng.normal(0, 0.3, samples), [2.0, 4.0])
+    scaler = StandardScaler().fit(features)
+    model = RandomForestClassifier(n_estimators=trees, random_state=seed).fit(scaler.transform(features), labels)
+    return model, scaler
+
+
+def write_standin(directory, model, scaler, compiled=False):
+    """Save the artifacts as a ModelStore cache for REPO_ID@main; returns the artifact directory"""
+    store = ModelStore(REPO_ID, revision="main", cache_dir=directory, offline=True)
+    target = store.root / STANDIN_SHA
+    target.mkdir(parents=True, exist_ok=True)
+    joblib.dump(model, target / MODEL_FILE)
+    joblib.dump(scaler, target / SCALER_FILE)
+    files = [MODEL_FILE, SCALER_FILE]
+    if compiled:
+        export_compiled(model, scaler, target / COMPILED_FILE)
+        files.append(COMPILED_FILE)
+    store.manifest_path.write_text(json.dumps({
+        "repo_id": REPO_ID,
+        "revision": "main",
+        "sha": STANDIN_SHA,
+        "files": {name: file_sha256(target / name) for name in files},
+        "repo_files": sorted(files),
+    }, indent=2))
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cache", default=MODELS_DIR / "standin", type=Path,
+                        help="ModelStore cache directory to write")
+    parser.add_argument("--samples", default=5000, type=int)
+    parser.add_argument("--trees", default=100, type=int)
+    parser.add_argument("--seed", default=0, type=int)
+    parser.add_argument("--compiled", action="store_true", help=f"also export {COMPILED_FILE}")
+    args = parser.parse_args()
+
+    model, scaler = train_standin(args.samples, args.trees, args.seed)
+    target = write_standin(args.cache, model, scaler, args.compiled)
+    print(f"wrote stand-in artifacts to {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+Command-line options shared by the scripts for choosing model artifacts
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+
+
+def add_model_arguments(parser):
+    parser.add_argument("--model", default=MODELS_DIR / "battery_model.pkl", type=Path)
+    parser.add_argument("--scaler", default=MODELS_DIR / "battery_scaler.pkl", type=Path)
+    parser.add_argument("--compiled", type=Path, help="use an exported .npz instead of the pickles")
+
+
+def load_model(args):
+    """Return (model, scaler) for the artifacts selected on the command line"""
+    if args.compiled:
+        from battery_health.compiled import load_compiled
+        return load_compiled(args.compiled)
+    import joblib
+    return joblib.load(args.model), joblib.load(args.scaler)
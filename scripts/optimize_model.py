@@ -0,0 +1,106 @@
+"""
+Write a smaller forest archive and compare it with the original model
+
+Keeps a subset of the trees, optionally limits their depth, and stores
+thresholds and probabilities as float32 with compact integer node indices.
+Reports class agreement with the original model on in-range readings,
+on-disk size, load time and per-row latency.
+
+Usage:
+    python scripts/optimize_model.py --trees 50 --max-depth 12
+    BATTERY_COMPILED_FILE=battery_forest_small.npz uvicorn --app-dir api asgi:app
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from model_args import MODELS_DIR, add_model_arguments, load_model
+from battery_health.compiled import OPTIMIZED_FILE, compiled_arrays, export_compiled, load_compiled, shrink_arrays
+from build_lookup_table import sample_in_range
+
+
+def median_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def latency(model, scaler, features, repeat):
+    """(single-row seconds, per-row seconds in a batch of len(features))"""
+    single = features[:1]
+    single_row = median_seconds(lambda: model.predict_proba(scaler.transform(single)), repeat)
+    batch = median_seconds(lambda: model.predict_proba(scaler.transform(features)), max(3, repeat // 50))
+    return single_row, batch / len(features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    add_model_arguments(parser)
+    parser.add_argument("--output", default=MODELS_DIR / OPTIMIZED_FILE, type=Path)
+    parser.add_argument("--trees", type=int, help="keep only the first N trees")
+    parser.add_argument("--max-depth", type=int, help="cut every tree at this depth")
+    parser.add_argument("--samples", default=20000, type=int, help="readings used to measure agreement")
+    parser.add_argument("--repeat", default=200, type=int)
+    parser.add_argument("--min-agreement", type=float,
+                        help="exit non-zero when class agreement falls below this fraction")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    model, scaler = load_model(args)
+    original_load = time.perf_counter() - started
+    arrays = compiled_arrays(model, scaler)
+    np.savez(args.output, **shrink_arrays(arrays, args.trees, args.max_depth))
+    small_model, small_scaler = load_compiled(args.output)
+
+    features = sample_in_range(args.samples)
+    expected = model.predict_proba(scaler.transform(features))
+    actual = small_model.predict_proba(small_scaler.transform(features))
+    agreement = float(np.mean(np.argmax(actual, axis=1) == np.argmax(expected, axis=1)))
+    delta = np.abs(actual - expected)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = Path(tmp) / "full.npz"
+        export_compiled(model, scaler, full_path)
+        sizes = {"compiled": full_path.stat().st_size, "optimized": args.output.stat().st_size}
+        load_times = {
+            "compiled": median_seconds(lambda: load_compiled(full_path), 20),
+            "optimized": median_seconds(lambda: load_compiled(args.output), 20),
+        }
+        full_model, full_scaler = load_compiled(full_path)
+    if not args.compiled:
+        sizes["pickle"] = args.model.stat().st_size + args.scaler.stat().st_size
+        load_times["pickle"] = original_load
+
+    batch = features[:1000]
+    latencies = {"original": latency(model, scaler, batch, args.repeat)}
+    if not args.compiled:
+        latencies["compiled"] = latency(full_model, full_scaler, batch, args.repeat)
+    latencies["optimized"] = latency(small_model, small_scaler, batch, args.repeat)
+
+    print(f"Wrote {args.output}: {small_model.n_estimators} trees, depth {small_model.max_depth}, "
+          f"{len(small_model.threshold):,} nodes")
+    print(f"Class agreement:        {agreement:.4%} of {args.samples} readings")
+    print(f"Probability error mean: {delta.mean():.4f}")
+    print(f"Probability error max:  {delta.max():.4f}")
+    print(f"{'artifact':<10} {'size KiB':>10} {'load ms':>9}")
+    for name in sizes:
+        print(f"{name:<10} {sizes[name] / 1024:>10.1f} {load_times[name] * 1000:>9.2f}")
+    print(f"{'model':<10} {'1 row us':>10} {'per row us':>11}  (batch of {len(batch)})")
+    for name, (single_row, per_row) in latencies.items():
+        print(f"{name:<10} {single_row * 1e6:>10.1f} {per_row * 1e6:>11.2f}")
+
+    if args.min_agreement is not None and agreement < args.min_agreement:
+        print(f"Agreement below {args.min_agreement:.2%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
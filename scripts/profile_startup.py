@@ -0,0 +1,79 @@
+"""
+Profile a cold start of the Vercel handler in a fresh interpreter
+
+Reports how long the handler module takes to import, how fast preflight and
+health answer before any model is loaded, and the import / download /
+unpickle breakdown of the first model load.
+
+Usage:
+    python scripts/profile_startup.py
+    HF_HUB_OFFLINE=1 BATTERY_MODEL_CACHE=/tmp/models python scripts/profile_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+API_DIR = Path(__file__).parent.parent / "api"
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import index
+module_import = time.perf_counter() - started
+
+def timed(event):
+    started = time.perf_counter()
+    response = index.handler(event, None)
+    return response, time.perf_counter() - started
+
+_, preflight = timed({"httpMethod": "OPTIONS", "path": "/api/predict"})
+_, health = timed({"httpMethod": "GET", "path": "/api/health"})
+heavy_before_load = sorted(m for m in ("numpy", "sklearn", "joblib", "huggingface_hub") if m in sys.modules)
+response, first_predict = timed({"httpMethod": "POST", "path": "/api/predict", "body": json.dumps(
+    {"voltage": 12.2, "current": 200, "temperature": 35, "age_months": 42, "resistance": 0.045})})
+_, warm_predict = timed({"httpMethod": "POST", "path": "/api/predict", "body": json.dumps(
+    {"voltage": 12.2, "current": 200, "temperature": 35, "age_months": 42, "resistance": 0.045})})
+print(json.dumps({
+    "module_import_seconds": module_import,
+    "preflight_seconds": preflight,
+    "health_seconds": health,
+    "heavy_modules_before_load": heavy_before_load,
+    "first_predict_status": response["statusCode"],
+    "first_predict_seconds": first_predict,
+    "warm_predict_seconds": warm_predict,
+    "model_load": index.startup,
+}))
+"""
+
+
+def main():
+    # Eager loading is switched off so each phase can be timed on its own
+    env = dict(os.environ, BATTERY_EAGER_LOAD="0")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        return result.returncode
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    load = profile["model_load"]
+
+    print(f"handler module import   {profile['module_import_seconds'] * 1000:9.1f} ms")
+    print(f"OPTIONS preflight       {profile['preflight_seconds'] * 1000:9.1f} ms")
+    print(f"GET /health             {profile['health_seconds'] * 1000:9.1f} ms")
+    print(f"heavy modules before first POST: {', '.join(profile['heavy_modules_before_load']) or 'none'}")
+    if load["total_seconds"] is None:
+        print(f"model load failed (first POST returned {profile['first_predict_status']})")
+        return 1
+    print(f"model load: imports     {load['import_seconds'] * 1000:9.1f} ms")
+    print(f"model load: download    {load['download_seconds'] * 1000:9.1f} ms  ({load['artifact_source']})")
+    print(f"model load: unpickle    {load['load_seconds'] * 1000:9.1f} ms")
+    print(f"first POST (incl. load) {profile['first_predict_seconds'] * 1000:9.1f} ms")
+    print(f"warm POST               {profile['warm_predict_seconds'] * 1000:9.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
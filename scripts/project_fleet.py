@@ -0,0 +1,119 @@
+"""
+Project remaining useful life for a CSV or NDJSON export of a fleet's readings
+
+Writes one CSV row per reading and resistance growth scenario with the months
+until the battery is projected Weak and Failed. Readings are read and scored
+in chunks, each chunk's whole sweep in one predict_proba call, so memory stays
+flat and there is no row limit as there is for the API.
+
+Usage:
+    python scripts/project_fleet.py fleet.csv --output projections.csv
+    python scripts/project_fleet.py fleet.ndjson --compiled models/battery_forest.npz \
+        --horizon 120 --step 3 --growth expected=0.001 --growth hot_climate=0.003
+"""
+import argparse
+import csv
+import sys
+import time
+
+from model_args import add_model_arguments, load_model
+from battery_health.batch import parse_readings, validate_ranges
+from battery_health.bulk import ID_FIELD, READERS, detect_format, iter_chunks
+from battery_health.inference import FEATURES, InvalidReading
+from battery_health.projection import (
+    CHUNK_ROWS,
+    DEFAULT_HORIZON_MONTHS,
+    DEFAULT_THRESHOLDS,
+    format_projection,
+    parse_projection_options,
+    project_features,
+)
+
+FIELDS = [
+    "row", ID_FIELD, "scenario", "resistance_growth_per_month", "status",
+    "months_until_weak", "weak_at_age_months", "months_until_failed", "failed_at_age_months",
+    "failure_probability_at_horizon", "error",
+]
+AGE = FEATURES.index("age_months")
+
+
+def projection_body(args):
+    """Projection options as an API request body; raises ValueError for a malformed --growth"""
+    body = {"horizon_months": args.horizon, "step_months": args.step,
+            "thresholds": {"weak": args.weak_threshold, "failed": args.failed_threshold}}
+    if args.growth:
+        growth = {}
+        for item in args.growth:
+            name, separator, rate = item.partition("=")
+            if not separator or not name:
+                raise ValueError(f"--growth expects NAME=OHMS_PER_MONTH, got {item!r}")
+            growth[name] = rate
+        body["resistance_growth_per_month"] = growth
+    return body
+
+
+def project_stream(model, scaler, readings, writer, options):
+    """Project every reading and write its rows; returns (readings, failed)"""
+    months, scenarios, thresholds = options
+    rates = [rate for _, rate in scenarios]
+    # Enough readings per chunk that each predict_proba call sees about CHUNK_ROWS sweep rows
+    chunk_size = max(1, CHUNK_ROWS // (len(months) * len(scenarios)))
+    count = failed = 0
+    for chunk in iter_chunks(readings, chunk_size):
+        features, errors = parse_readings(chunk)
+        valid = validate_ranges(features, errors)
+        projected = project_features(model, scaler, features[valid], months, rates, thresholds)
+        j = 0
+        for i, reading in enumerate(chunk):
+            row = {"row": count + i, ID_FIELD: reading.get(ID_FIELD) if isinstance(reading, dict) else None}
+            if not valid[i]:
+                writer.writerow({**row, "error": errors[i]})
+                failed += 1
+                continue
+            projection = format_projection(features[i, AGE], months, scenarios, thresholds, projected, j)
+            j += 1
+            for scenario in projection["scenarios"]:
+                writer.writerow({**row, "status": projection["current"]["status"], **scenario})
+        count += len(chunk)
+    return count, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON file of readings, '-' for stdin")
+    parser.add_argument("--output", default="-", help="CSV result file, '-' for stdout (default)")
+    parser.add_argument("--input-format", choices=sorted(READERS))
+    parser.add_argument("--horizon", default=DEFAULT_HORIZON_MONTHS, type=int, help="months to project")
+    parser.add_argument("--step", default=1, type=int, help="months between projected points")
+    parser.add_argument("--growth", action="append", metavar="NAME=OHMS_PER_MONTH",
+                        help="resistance growth scenario, repeatable (default: slow, expected, fast)")
+    parser.add_argument("--weak-threshold", default=DEFAULT_THRESHOLDS["weak"], type=float)
+    parser.add_argument("--failed-threshold", default=DEFAULT_THRESHOLDS["failed"], type=float)
+    add_model_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        options = parse_projection_options(projection_body(args))
+    except (ValueError, InvalidReading) as e:
+        parser.error(str(e))
+    model, scaler = load_model(args)
+    input_format = args.input_format or detect_format(args.input)
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", newline="", encoding="utf-8")
+    started = time.perf_counter()
+    try:
+        writer = csv.DictWriter(sink, FIELDS)
+        writer.writeheader()
+        count, failed = project_stream(model, scaler, READERS[input_format](source), writer, options)
+    finally:
+        for stream in (source, sink):
+            if stream not in (sys.stdin, sys.stdout):
+                stream.close()
+    seconds = time.perf_counter() - started
+    print(f"Projected {count} readings ({failed} failed validation) over {len(options[0])} months "
+          f"x {len(options[1])} scenarios in {seconds:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Score a CSV or NDJSON export of battery readings in bounded memory
+
+Usage:
+    python scripts/score_bulk.py readings.csv --output scored.csv
+    cat readings.ndjson | python scripts/score_bulk.py - --input-format ndjson \
+        --output-format ndjson --compiled models/battery_forest.npz > scored.ndjson
+    python scripts/score_bulk.py readings.csv --output scored.csv --workers 8 \
+        --chunk-size 100000
+"""
+import argparse
+import sys
+
+from model_args import add_model_arguments, load_model
+from battery_health.bulk import DEFAULT_CHUNK_SIZE, READERS, detect_format, score_stream
+from battery_health.parallel import ParallelForest
+
+
+def open_stream(path, mode):
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="CSV or NDJSON file of readings, '-' for stdin")
+    parser.add_argument("--output", default="-", help="result file, '-' for stdout (default)")
+    parser.add_argument("--input-format", choices=sorted(READERS))
+    parser.add_argument("--output-format", choices=sorted(READERS))
+    parser.add_argument("--chunk-size", default=DEFAULT_CHUNK_SIZE, type=int)
+    parser.add_argument("--workers", default=1, type=int,
+                        help="worker processes for forest scoring; use with a large --chunk-size")
+    add_model_arguments(parser)
+    args = parser.parse_args()
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or (
+        detect_format(args.output) if args.output != "-" else input_format
+    )
+    model, scaler = load_model(args)
+    if args.workers > 1:
+        model = ParallelForest(model, workers=args.workers)
+
+    source = open_stream(args.input, "r")
+    sink = open_stream(args.output, "w")
+    try:
+        stats = score_stream(model, scaler, source, sink, input_format, output_format,
+                             chunk_size=args.chunk_size)
+    finally:
+        for stream in (source, sink):
+            if stream not in (sys.stdin, sys.stdout):
+                stream.close()
+        if isinstance(model, ParallelForest):
+            model.close()
+
+    print(f"Scored {stats['rows']} rows ({stats['failed']} failed validation) in "
+          f"{stats['seconds']:.2f}s: {stats['rows_per_second']:,.0f} rows/sec", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())